@@ -1,9 +1,10 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
-from PIL import Image
-import json, os, re, time, cv2, platform, threading, math
+from PIL import Image, ImageOps
+import json, os, re, time, cv2, platform, threading, math, heapq, itertools, collections, sqlite3, uuid, io, hashlib, hmac
+import asyncio, queue, urllib.request, http.server, csv, concurrent.futures, socket, socketserver, base64, stat, gc, tracemalloc, mmap
 
-# Optional dependencies for Memory Assistant (face recognition only)
+# Optional dependencies for Memory Assistant (face recognition + voice)
 try:
     import numpy as np
     HAS_NUMPY = True
@@ -14,98 +15,957 @@ try:
     HAS_FACE_RECOGNITION = True
 except ImportError:
     HAS_FACE_RECOGNITION = False
+try:
+    import speech_recognition as sr
+    HAS_SPEECH = True
+except ImportError:
+    HAS_SPEECH = False
 
 ctk.set_appearance_mode("dark")
 
 DB_FILE="database.json"
 IMAGE_FOLDER="images"
 ENCODINGS_CACHE_FILE = "face_encodings_cache.json"
+SHARD_FOLDER = "shards"          # one people file and one encodings cache per user account
+PASSWORD_ITERATIONS = 200000     # PBKDF2-SHA256 rounds for stored passwords
 
 # ---------------- DATABASE ----------------
-def load_db():
-    if not os.path.exists(DB_FILE):
-        with open(DB_FILE,"w") as f:
-            json.dump({"people":[]},f)
+def _ensure_person_ids(data):
+    """Give every person a stable id so history (e.g. the sighting log) survives renames."""
+    for person in data.get("people", []):
+        if not person.get("id"):
+            person["id"] = uuid.uuid4().hex[:12]
+    return data
+
+_DB_SEEN = {}  # database path -> {person id: record digest} as this process last read or wrote it
+
+def _record_digest(person):
+    return hashlib.sha1(json.dumps(person, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _remember_people(path, data):
+    _DB_SEEN[path] = {p["id"]: _record_digest(p) for p in data.get("people", []) if p.get("id")}
+
+def _merge_people(data, path):
+    """Fold in what another process (e.g. the recognition service) changed in path since this one last read or
+    wrote it: people it added or edited are taken over, people it removed are dropped, and this process's own
+    additions and edits are kept. data["people"] and its records are updated in place, so pages holding a
+    person dict see the change. Returns how many people changed."""
+    seen = _DB_SEEN.get(path)
+    if seen is None or not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r") as f:
+            theirs = {p["id"]: p for p in json.load(f).get("people", []) if p.get("id")}
+    except (json.JSONDecodeError, IOError):
+        return 0
+    people = data.setdefault("people", [])
+    kept, changed = [], 0
+    for p in people:
+        pid = p.get("id")
+        if pid in seen and pid not in theirs:  # removed elsewhere
+            changed += 1
+            continue
+        other = theirs.get(pid)
+        if other is not None and pid in seen and _record_digest(p) == seen[pid] and _record_digest(other) != seen[pid]:
+            p.clear()  # edited elsewhere and not here
+            p.update(other)
+            changed += 1
+        kept.append(p)
+    have = {p.get("id") for p in kept}
+    for pid, other in theirs.items():
+        if pid not in have and pid not in seen:  # added elsewhere
+            kept.append(other)
+            changed += 1
+    people[:] = kept
+    return changed
+
+def shard_path(user_id):
+    return os.path.join(SHARD_FOLDER, f"{user_id}.json")
+
+def encodings_cache_path(db):
+    """Encodings cache that belongs with db: the owner's shard cache, or the device-wide one for the legacy list."""
+    owner = (db or {}).get("owner")
+    return os.path.join(SHARD_FOLDER, f"{owner}.encodings.json") if owner else ENCODINGS_CACHE_FILE
+
+def load_db(user_id=None):
+    """The device database (users, plus people from before accounts existed), or with user_id that user's shard."""
+    path = shard_path(user_id) if user_id else DB_FILE
+    empty = {"owner": user_id, "people": []} if user_id else {"users": [], "people": []}
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path,"w") as f:
+            json.dump(empty,f)
     try:
-        with open(DB_FILE,"r") as f:
-            return json.load(f)
+        with open(path,"r") as f:
+            data = json.load(f)
     except (json.JSONDecodeError, IOError):
-        return {"people":[]}
+        return empty
+    if user_id:
+        data["owner"] = user_id
+    _ensure_person_ids(data)
+    _remember_people(path, data)
+    return data
 
 def save_db(data):
-    with open(DB_FILE,"w") as f:
+    """Write data back where it came from: the owner's shard, or the device database. People another process
+    changed in the file since data was loaded are merged in first (see _merge_people) instead of overwritten.
+    Returns how many people that merge changed in data."""
+    _ensure_person_ids(data)
+    path = shard_path(data["owner"]) if data.get("owner") else DB_FILE
+    merged = _merge_people(data, path)
+    tmp=path+".tmp"
+    with open(tmp,"w") as f:
         json.dump(data,f,indent=4)
+    os.replace(tmp,path)  # never leave a half-written database behind
+    _remember_people(path, data)
+    return merged
+
+def _hash_password(password, salt, iterations=PASSWORD_ITERATIONS):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations).hex()
+
+def find_user(email, device=None):
+    key = (email or "").strip().lower()
+    return next((u for u in (device or load_db()).get("users", []) if u.get("email") == key), None)
+
+def check_password(user, password):
+    return hmac.compare_digest(user["password"], _hash_password(password or "", bytes.fromhex(user["salt"]),
+                                                                user.get("iterations", PASSWORD_ITERATIONS)))
+
+def sign_in(name, email, password):
+    """Return the account for email, creating it on first sign-in. Raises ValueError for a wrong password."""
+    device = load_db()
+    user = find_user(email, device)
+    if user is None:
+        salt = os.urandom(16)
+        user = {"id": uuid.uuid4().hex[:12], "name": name, "email": email.strip().lower(), "salt": salt.hex(),
+                "password": _hash_password(password, salt), "iterations": PASSWORD_ITERATIONS}
+        device.setdefault("users", []).append(user)
+        save_db(device)
+    elif not check_password(user, password):
+        raise ValueError("Incorrect password for this email.")
+    migrate_legacy_people(device, user["id"])
+    migrate_legacy_sightings(user["id"])
+    return user
+
+def migrate_legacy_people(device, user_id):
+    """Move people still in the device database (from before accounts existed) into user_id's shard, together with
+    their cached encodings. The shard is written before the device list is cleared, and people are matched by id,
+    so an interrupted migration is simply finished by the next sign-in. Returns how many people moved."""
+    legacy = device.get("people") or []
+    if not legacy:
+        return 0
+    shard = load_db(user_id)
+    have = {p.get("id") for p in shard["people"]}
+    shard["people"].extend(p for p in legacy if p.get("id") not in have)
+    save_db(shard)
+    paths = {p.get("image") for p in legacy} | {s for p in legacy for s in (p.get("samples") or [])}
+    old, new = _read_encodings_file(), _read_encodings_file(encodings_cache_path(shard))
+    for backend, entries in old.items():
+        moved = {k: v for k, v in entries.items() if k in paths}
+        new.setdefault(backend, {}).update(moved)
+        old[backend] = {k: v for k, v in entries.items() if k not in paths}
+    _write_encodings_file(new, encodings_cache_path(shard))
+    _write_encodings_file(old)
+    device["people"] = []
+    save_db(device)
+    return len(legacy)
+
+# ---------------- IMAGE INGESTION ----------------
+INGEST_MAX_SIDE = 1280      # canonical working size: longest side in pixels after ingestion
+INGEST_JPEG_QUALITY = 90
+
+def content_image_path(digest):
+    """images/ab/cd/abcd….jpg — sharded so no directory grows past a few hundred files."""
+    return os.path.join(IMAGE_FOLDER, digest[:2], digest[2:4], digest + ".jpg")
+
+def addressed_digest(path):
+    """The digest a content-addressed path is named by, or None for any other path. Reads nothing."""
+    digest = os.path.splitext(os.path.basename(path or ""))[0]
+    if len(digest) == 64 and all(c in "0123456789abcdef" for c in digest) \
+            and os.path.normpath(path).endswith(os.path.normpath(content_image_path(digest))):
+        return digest
+    return None
+
+def image_digest(path):
+    """SHA-256 of an image's content: free for content-addressed paths, otherwise hashed from the file (None if unreadable)."""
+    digest = addressed_digest(path)
+    if digest:
+        return digest
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (OSError, TypeError):
+        return None
+
+def ingest_image(source):
+    """Normalize an image and store it content-addressed under IMAGE_FOLDER. Returns the stored path.
+
+    source is a file path, a PIL image or a BGR numpy array. EXIF orientation is applied, the image is
+    downscaled to INGEST_MAX_SIDE and re-encoded as JPEG at INGEST_JPEG_QUALITY, and the file is named by
+    the SHA-256 of the result, so uploading the same photo twice stores (and later encodes) it once.
+    Raises OSError/ValueError if the image cannot be read.
+    """
+    return store_image(normalize_image(source))
+
+def normalize_image(source):
+    """The normalized JPEG bytes ingest_image would store for source, without storing anything."""
+    if isinstance(source, str):
+        with Image.open(source) as im:
+            im = ImageOps.exif_transpose(im)
+            img = im.convert("RGB")
+    elif isinstance(source, Image.Image):
+        img = ImageOps.exif_transpose(source).convert("RGB")
+    else:
+        arr = np.asarray(source, dtype=np.uint8)
+        if arr.ndim == 2:
+            arr = cv2.cvtColor(arr, cv2.COLOR_GRAY2RGB)
+        elif arr.shape[-1] == 4:
+            arr = cv2.cvtColor(arr, cv2.COLOR_BGRA2RGB)
+        else:
+            arr = cv2.cvtColor(arr, cv2.COLOR_BGR2RGB)
+        img = Image.fromarray(np.ascontiguousarray(arr))
+    if max(img.size) > INGEST_MAX_SIDE:
+        img.thumbnail((INGEST_MAX_SIDE, INGEST_MAX_SIDE), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=INGEST_JPEG_QUALITY)
+    return buf.getvalue()
+
+def store_image(data):
+    """Store normalized JPEG bytes under their content hash. Returns the path."""
+    path = content_image_path(hashlib.sha256(data).hexdigest())
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return path
+
+# ---------------- SIGHTING LOG ----------------
+SIGHTINGS_DB_FILE = "sightings.db"
+SIGHTING_FLUSH_SEC = 2.0        # writer thread commits buffered sightings this often
+SIGHTING_VISIT_GAP_SEC = 30.0   # a track unseen for this long closes its visit
+
+def _day_of(ts):
+    """Local calendar day of a timestamp as YYYYDDD: the log's time partition key."""
+    lt = time.localtime(ts)
+    return lt.tm_year * 1000 + lt.tm_yday
+
+class SightingLog:
+    """Append-only log of who was seen when, in SQLite, written by one background thread in batched transactions.
+
+    Sightings are deduplicated per (source, track, person): a track seen frame after frame becomes one visit
+    row whose last_seen keeps moving, not one row per frame. Rows carry a day partition key; indexes on
+    (person_id, last_seen) and (day, person_id) plus an incrementally maintained per-day rollup table keep
+    "last seen" and daily summaries at a few milliseconds however long the log grows.
+    """
+    def __init__(self, path=SIGHTINGS_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._open = {}     # (source, track, person_id) -> {"rowid", "name", "first", "last", "frames", "flushed_last"}
+        self._thread = None
+        self._stop = threading.Event()
+        con = self._connect()
+        try:
+            con.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS visits (
+                    id INTEGER PRIMARY KEY, person_id TEXT NOT NULL, name TEXT, source TEXT,
+                    day INTEGER NOT NULL, first_seen REAL NOT NULL, last_seen REAL NOT NULL, frames INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS visits_person_last ON visits(person_id, last_seen);
+                CREATE INDEX IF NOT EXISTS visits_day ON visits(day, person_id);
+                CREATE TABLE IF NOT EXISTS daily (
+                    person_id TEXT NOT NULL, day INTEGER NOT NULL, visits INTEGER NOT NULL, seconds REAL NOT NULL,
+                    first_seen REAL NOT NULL, last_seen REAL NOT NULL, PRIMARY KEY (person_id, day)) WITHOUT ROWID;
+            """)
+            con.commit()
+        finally:
+            con.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def record(self, source, track_id, person_id, name, ts=None):
+        """Note one sighting; cheap enough to call for every recognized face on every frame."""
+        ts = time.time() if ts is None else ts
+        key = (source, track_id, person_id)
+        with self._lock:
+            v = self._open.get(key)
+            if v is None or ts - v["last"] > SIGHTING_VISIT_GAP_SEC:
+                self._open[key] = {"rowid": None, "name": name, "first": ts, "last": ts, "frames": 1, "flushed_last": ts}
+            else:
+                v["last"] = ts
+                v["frames"] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, name="sighting-log", daemon=True)
+                self._thread.start()
+
+    def _writer(self):
+        con = self._connect()
+        try:
+            while not self._stop.wait(SIGHTING_FLUSH_SEC):
+                self._flush(con)
+            self._flush(con)
+        finally:
+            con.close()
+
+    def _flush(self, con):
+        now = time.time()
+        with self._lock:
+            pending = [(k, dict(v)) for k, v in self._open.items() if v["rowid"] is None or v["last"] != v["flushed_last"]]
+            for k in [k for k, v in self._open.items() if now - v["last"] > SIGHTING_VISIT_GAP_SEC and v["rowid"] is not None
+                      and v["last"] == v["flushed_last"]]:
+                del self._open[k]
+        if not pending:
+            return
+        written = {}
+        with con:
+            for (source, track, person_id), v in pending:
+                day = _day_of(v["first"])
+                if v["rowid"] is None:
+                    cur = con.execute(
+                        "INSERT INTO visits (person_id, name, source, day, first_seen, last_seen, frames) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (person_id, v["name"], str(source), day, v["first"], v["last"], v["frames"]))
+                    written[(source, track, person_id)] = cur.lastrowid
+                    con.execute(
+                        "INSERT INTO daily (person_id, day, visits, seconds, first_seen, last_seen) VALUES (?, ?, 1, ?, ?, ?) "
+                        "ON CONFLICT(person_id, day) DO UPDATE SET visits = visits + 1, seconds = seconds + excluded.seconds, "
+                        "first_seen = MIN(first_seen, excluded.first_seen), last_seen = MAX(last_seen, excluded.last_seen)",
+                        (person_id, day, v["last"] - v["first"], v["first"], v["last"]))
+                else:
+                    con.execute("UPDATE visits SET last_seen = ?, frames = ? WHERE id = ?", (v["last"], v["frames"], v["rowid"]))
+                    con.execute("UPDATE daily SET seconds = seconds + ?, last_seen = MAX(last_seen, ?) WHERE person_id = ? AND day = ?",
+                                (v["last"] - v["flushed_last"], v["last"], person_id, day))
+        with self._lock:
+            for key, v in pending:
+                cur = self._open.get(key)
+                if cur is None or cur["first"] != v["first"]:
+                    continue  # the visit was replaced while we were writing
+                if key in written:
+                    cur["rowid"] = written[key]
+                cur["flushed_last"] = v["last"]
+
+    def close(self):
+        """Flush buffered sightings and stop the writer thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def last_seen(self, person_id):
+        """(timestamp, source) of the person's most recent sighting, or (None, None)."""
+        with self._lock:
+            live = max(((v["last"], k[0]) for k, v in self._open.items() if k[2] == person_id), default=None)
+        con = self._connect()
+        try:
+            row = con.execute("SELECT last_seen, source FROM visits WHERE person_id = ? ORDER BY last_seen DESC LIMIT 1",
+                              (person_id,)).fetchone()
+        finally:
+            con.close()
+        best = max([r for r in (live, row) if r], default=None, key=lambda r: r[0])
+        return (best[0], best[1]) if best else (None, None)
+
+    def daily_rollup(self, person_id, days=7):
+        """[(day start timestamp, visits, seconds)] for the person's most recent `days` days with sightings."""
+        con = self._connect()
+        try:
+            rows = con.execute("SELECT first_seen, visits, seconds FROM daily WHERE person_id = ? ORDER BY day DESC LIMIT ?",
+                               (person_id, days)).fetchall()
+        finally:
+            con.close()
+        return rows
+
+    def visits_between(self, start_ts, end_ts, person_id=None):
+        """Visits overlapping [start_ts, end_ts], narrowed by the day partition index first (visits are filed under
+        the day they started, so ones that began more than a day before start_ts are not returned)."""
+        sql = ("SELECT person_id, name, source, first_seen, last_seen, frames FROM visits "
+               "WHERE day BETWEEN ? AND ? AND last_seen >= ? AND first_seen <= ?")
+        args = [_day_of(start_ts - 86400), _day_of(end_ts), start_ts, end_ts]
+        if person_id is not None:
+            sql += " AND person_id = ?"
+            args.append(person_id)
+        con = self._connect()
+        try:
+            return con.execute(sql + " ORDER BY first_seen", args).fetchall()
+        finally:
+            con.close()
 
 # ---------------- MEMORY ASSISTANT HELPERS ----------------
-def _load_encodings_cache():
-    """Load cached face encodings from disk. Returns dict: path -> {"mtime": float, "encoding": list}."""
-    if not os.path.exists(ENCODINGS_CACHE_FILE):
+def _read_encodings_file(path=ENCODINGS_CACHE_FILE):
+    """Raw cache file as backend name -> {path: entry}. The old flat layout (dlib only) reads as the "dlib" namespace."""
+    if not os.path.exists(path):
         return {}
     try:
-        with open(ENCODINGS_CACHE_FILE, "r") as f:
+        with open(path, "r") as f:
             data = json.load(f)
-        return {k: {"mtime": v["mtime"], "encoding": np.array(v["encoding"]) if HAS_NUMPY else v["encoding"]} for k, v in data.items()}
     except Exception:
         return {}
+    return data.get("backends", {}) if "backends" in data else {"dlib": data}
+
+def _write_encodings_file(spaces, path=ENCODINGS_CACHE_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"backends": spaces}, f, indent=0)
+    os.replace(tmp, path)
 
-def _save_encodings_cache(cache):
-    """Save encodings cache to disk. cache: path -> {"mtime": float, "encoding": array or list}."""
+def _load_encodings_cache(backend="dlib", path=ENCODINGS_CACHE_FILE):
+    """Load one backend's cached face encodings. Returns dict: path -> {"mtime": float, "sha": str|None, "encoding": array}."""
     try:
+        data = _read_encodings_file(path).get(backend, {})
+        return {k: {"mtime": v["mtime"], "sha": v.get("sha"),
+                    "encoding": np.asarray(v["encoding"], dtype=np.float32) if HAS_NUMPY else v["encoding"]} for k, v in data.items()}
+    except Exception:
+        return {}
+
+def _save_encodings_cache(cache, backend="dlib", path=ENCODINGS_CACHE_FILE):
+    """Save one backend's encodings, leaving other backends' namespaces untouched. cache: path -> {"mtime", "encoding"}."""
+    try:
+        spaces = _read_encodings_file(path)
         data = {}
-        for path, v in cache.items():
+        for img_path, v in cache.items():
             enc = v["encoding"]
-            data[path] = {"mtime": v["mtime"], "encoding": enc.tolist() if hasattr(enc, "tolist") else list(enc)}
-        with open(ENCODINGS_CACHE_FILE, "w") as f:
-            json.dump(data, f, indent=0)
+            data[img_path] = {"mtime": v["mtime"], "encoding": enc.tolist() if hasattr(enc, "tolist") else list(enc)}
+            if v.get("sha"):
+                data[img_path]["sha"] = v["sha"]
+        spaces[backend] = data
+        _write_encodings_file(spaces, path)
     except Exception:
         pass
 
-def load_known_faces_from_app_db(db):
-    """Returns (encodings_list, names_list, relations_dict, metadata_dict). Uses a disk cache so 100+ users don't recompute encodings every run."""
+ENCODE_BATCH_BUDGET_MS = 40  # longest a face waits for its encoding batch to fill
+ENCODE_BATCH_MAX = 32        # faces per encoder call at most
+ENROLL_BATCH = 8             # enrollment images decoded and encoded together (bounds peak memory)
+
+def _encode_batch(items):
+    """Encode the faces of several (rgb_image, locations) pairs. Returns one list of encodings per item.
+
+    Landmarks are still found per image, but all descriptors go through a single dlib call when the
+    installed dlib has the batched compute_face_descriptor; otherwise falls back to one call per image.
+    """
+    results = [[] for _ in items]
+    todo = [i for i, (_, locs) in enumerate(items) if len(locs)]
+    if not todo:
+        return results
+    try:
+        api = face_recognition.api
+        images, shapes = [], []
+        for i in todo:
+            img, locs = items[i]
+            dets = api.dlib.full_object_detections()
+            for raw in api._raw_face_landmarks(img, locs, model="small"):
+                dets.append(raw)
+            images.append(img)
+            shapes.append(dets)
+        descriptors = api.face_encoder.compute_face_descriptor(images, shapes, 1)
+        for i, descs in zip(todo, descriptors):
+            results[i] = [np.array(d, dtype=np.float32) for d in descs]
+    except Exception:
+        for i in todo:
+            img, locs = items[i]
+            results[i] = [np.asarray(e, dtype=np.float32) for e in face_recognition.face_encodings(img, locs)]
+    return results
+
+EMBEDDING_BACKEND = os.environ.get("MA_EMBEDDING_BACKEND", "dlib")  # "dlib" or "sface"
+DLIB_TOLERANCE = 0.4            # Euclidean distance between dlib descriptors below which two faces match
+SFACE_MODEL_FILE = os.environ.get("MA_SFACE_MODEL", os.path.join("models", "face_recognition_sface_2021dec.onnx"))
+SFACE_COSINE_THRESHOLD = 0.363  # OpenCV's published same-person cosine similarity for SFace
+SFACE_INPUT_SIZE = 112
+SFACE_CROP_MARGIN = 0.15        # detector boxes are tight; SFace was trained on crops that include brow and chin
+
+class DlibBackend:
+    """dlib ResNet descriptors through face_recognition (128-d)."""
+    name = "dlib"
+    dim = 128
+    threshold = DLIB_TOLERANCE
+    _lock = threading.Lock()  # face_recognition's dlib models are process-wide and not thread-safe
+
+    def encode(self, items):
+        with self._lock:
+            return _encode_batch(items)
+
+class SFaceBackend:
+    """OpenCV's SFace ONNX recognizer run through cv2.dnn on the CPU (128-d).
+
+    Faces are cut square around the detector box and resized to 112x112 instead of landmark-aligned.
+    Features are L2-normalised, so the gallery's Euclidean distance d relates to SFace's cosine score
+    by d = sqrt(2 - 2 cos) and the cosine threshold converts directly.
+    """
+    name = "sface"
+    dim = 128
+    threshold = math.sqrt(2.0 - 2.0 * SFACE_COSINE_THRESHOLD)
+
+    def __init__(self, model_path=SFACE_MODEL_FILE):
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self._lock = threading.Lock()  # one cv2.dnn.Net must not run forward() from two threads at once
+
+    def _crop(self, img, loc):
+        top, right, bottom, left = loc
+        side = max(bottom - top, right - left) * (1.0 + 2 * SFACE_CROP_MARGIN)
+        cy, cx = (top + bottom) / 2.0, (left + right) / 2.0
+        y0, x0 = int(max(0, cy - side / 2)), int(max(0, cx - side / 2))
+        y1, x1 = int(min(img.shape[0], cy + side / 2)), int(min(img.shape[1], cx + side / 2))
+        crop = img[y0:y1, x0:x1]
+        if crop.size == 0:
+            crop = np.zeros((SFACE_INPUT_SIZE, SFACE_INPUT_SIZE, 3), np.uint8)
+        return cv2.resize(crop, (SFACE_INPUT_SIZE, SFACE_INPUT_SIZE))
+
+    def _forward(self, crops):
+        # Inputs are already RGB, which is the channel order SFace expects, so no swapRB.
+        blob = cv2.dnn.blobFromImages(crops, 1.0, (SFACE_INPUT_SIZE, SFACE_INPUT_SIZE), (0, 0, 0), False, False)
+        with self._lock:
+            self.net.setInput(blob)
+            return np.asarray(self.net.forward(), dtype=np.float32).reshape(len(crops), -1)
+
+    def encode(self, items):
+        """Same contract as _encode_batch: one list of encodings per (rgb_image, locations) pair."""
+        crops, owners = [], []
+        for i, (img, locs) in enumerate(items):
+            for loc in locs:
+                crops.append(self._crop(img, loc))
+                owners.append(i)
+        results = [[] for _ in items]
+        if not crops:
+            return results
+        try:
+            feats = self._forward(crops)
+        except cv2.error:
+            feats = np.vstack([self._forward([c]) for c in crops])  # exported with a fixed batch size of 1
+        feats /= np.maximum(np.linalg.norm(feats, axis=1, keepdims=True), 1e-12)
+        for i, f in zip(owners, feats):
+            results[i].append(f)
+        return results
+
+EMBEDDING_BACKENDS = {"dlib": DlibBackend, "sface": SFaceBackend}
+_backend_instances = {}
+
+def get_embedding_backend(name=None):
+    """The named (default: configured) embedding backend, created once. Falls back to dlib if it cannot load."""
+    name = name or EMBEDDING_BACKEND
+    if name not in _backend_instances:
+        try:
+            _backend_instances[name] = EMBEDDING_BACKENDS[name]()
+        except Exception as e:
+            print(f"Embedding backend {name!r} unavailable ({e}); using dlib")
+            _backend_instances[name] = get_embedding_backend("dlib") if name != "dlib" else DlibBackend()
+    return _backend_instances[name]
+
+class EncodingBatcher:
+    """Collects encode requests from recognition workers and runs them through one batched encoder call.
+
+    A batch is flushed once every expected producer has a request queued, once it holds as many faces as
+    fit in budget_ms at the measured per-face cost, or once its oldest request has waited budget_ms.
+    With a single producer there is nothing to batch with, so encode() runs directly on the caller's thread.
+    """
+    def __init__(self, budget_ms=ENCODE_BATCH_BUDGET_MS, max_batch=ENCODE_BATCH_MAX, encode_fn=None):
+        self.budget = budget_ms / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.encode_fn = encode_fn or get_embedding_backend().encode
+        self.expected_producers = 1
+        self.face_cost = None  # EMA seconds per face
+        self.stats = {"calls": 0, "faces": 0}
+        self._cond = threading.Condition()
+        self._queue = []  # [(enqueued_at, (rgb, locations), slot)]
+        self._thread = None
+        self._encode_lock = threading.Lock()  # the flusher, workers and encode_many callers share one encoder
+
+    def _timed(self, items):
+        faces = sum(len(locs) for _, locs in items)
+        with self._encode_lock:
+            t0 = time.perf_counter()
+            out = self.encode_fn(items)
+            if faces:
+                cost = (time.perf_counter() - t0) / faces
+                self.face_cost = cost if self.face_cost is None else 0.8 * self.face_cost + 0.2 * cost
+            self.stats["calls"] += 1
+            self.stats["faces"] += faces
+        return out
+
+    def target_faces(self):
+        """Faces per batch that fit in the latency budget at the measured per-face cost."""
+        if not self.face_cost:
+            return self.max_batch
+        return max(1, min(self.max_batch, int(self.budget / self.face_cost)))
+
+    def encode(self, rgb, locations):
+        """Encodings for the faces at locations in rgb; blocks until its batch has run."""
+        if not len(locations):
+            return []
+        if self.expected_producers <= 1:
+            return self._timed([(rgb, locations)])[0]
+        slot = {"done": threading.Event(), "result": None}
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flusher, name="encode-batcher", daemon=True)
+                self._thread.start()
+            self._queue.append((time.perf_counter(), (rgb, locations), slot))
+            self._cond.notify()
+        slot["done"].wait()
+        if isinstance(slot["result"], Exception):
+            raise slot["result"]
+        return slot["result"]
+
+    def encode_many(self, items):
+        """Batch-encode a known list of (rgb, locations) pairs (e.g. enrollment images) on the caller's thread."""
+        results, batch, faces = [], [], 0
+        for item in items:
+            batch.append(item)
+            faces += len(item[1])
+            if faces >= self.max_batch:
+                results.extend(self._timed(batch))
+                batch, faces = [], 0
+        if batch:
+            results.extend(self._timed(batch))
+        return results
+
+    def _ready(self):
+        if not self._queue:
+            return False
+        faces = sum(len(item[1]) for _, item, _ in self._queue)
+        waited = time.perf_counter() - self._queue[0][0]
+        return (len(self._queue) >= self.expected_producers or faces >= self.target_faces()
+                or waited >= self.budget)
+
+    def _flusher(self):
+        while True:
+            with self._cond:
+                while not self._ready():
+                    if not self._queue:
+                        if not self._cond.wait(5.0) and not self._queue:
+                            self._thread = None  # idle: exit, the next encode() starts a new flusher
+                            return
+                    else:
+                        self._cond.wait(max(0.001, self.budget - (time.perf_counter() - self._queue[0][0])))
+                batch, faces = [], 0
+                while self._queue and (not batch or faces + len(self._queue[0][1][1]) <= self.max_batch):
+                    entry = self._queue.pop(0)
+                    batch.append(entry)
+                    faces += len(entry[1][1])
+            try:
+                outs = self._timed([item for _, item, _ in batch])
+            except Exception as e:
+                outs = [e] * len(batch)
+            for (_, _, slot), out in zip(batch, outs):
+                slot["result"] = out
+                slot["done"].set()
+
+def benchmark_encoding_batches(paths, batch_sizes=(1, 2, 4, 8, 16, 32), faces=64, backend=None):
+    """Faces encoded per second for each batch size, using the first face found in each image."""
+    backend = backend or get_embedding_backend()
+    samples = []
+    for p in paths:
+        try:
+            img = face_recognition.load_image_file(p)
+        except Exception:
+            continue
+        locs = face_recognition.face_locations(img)
+        if locs:
+            samples.append((img, locs[:1]))
+    if not samples:
+        return []
+    items = [samples[i % len(samples)] for i in range(faces)]
+    results = []
+    for size in batch_sizes:
+        t0 = time.perf_counter()
+        for start in range(0, len(items), size):
+            backend.encode(items[start:start + size])
+        elapsed = time.perf_counter() - t0
+        results.append({"batch": size, "faces_per_sec": len(items) / elapsed, "ms_per_face": 1000.0 * elapsed / len(items)})
+    return results
+
+def _cache_entry_valid(entry, path, mtime):
+    """A cached encoding still describes path if the file is untouched, or if its content is what was encoded.
+    mtime changes whenever a gallery is copied to another device, so it is only the fast path: content-addressed
+    photos are valid by name, and other photos are re-hashed (far cheaper than re-encoding) before giving up."""
+    if entry is None:
+        return False
+    if entry.get("mtime") == mtime:
+        return True
+    digest = image_digest(path)
+    return digest is not None and digest in (entry.get("sha"), addressed_digest(path))
+
+def load_known_faces_from_app_db(db, batcher=None, backend=None):
+    """Returns (encodings_list, names_list, relations_dict, metadata_dict). Uses a disk cache so 100+ users don't recompute encodings every run.
+    Uncached images are encoded ENROLL_BATCH at a time through the batched encoder. The cache is kept per backend,
+    so after switching backends each photo is re-encoded the first time it is needed and then cached again.
+    Photos missing from the cache are looked up by content digest in the shard's gallery pack (written when a
+    gallery bundle was imported) before they are encoded."""
     encodings_list, names_list = [], []
     relations_dict, metadata_dict = {}, {}
     people = db.get("people", [])
     if not HAS_FACE_RECOGNITION:
         return encodings_list, names_list, relations_dict, metadata_dict
-    cache = _load_encodings_cache()
+    backend = backend or get_embedding_backend()
+    batcher = batcher or EncodingBatcher(encode_fn=backend.encode)
+    cache_path = encodings_cache_path(db)
+    cache = _load_encodings_cache(backend.name, cache_path)
     cache_updated = False
-    for person in people:
+    found = {}  # (index into people, image path) -> encoding
+    todo = []   # (index, img_path, mtime) still to encode
+    pack = False  # opened on the first cache miss
+    for i, person in enumerate(people):
         name = person.get("name", "").strip()
-        rel = person.get("relation", "").strip() or "Stranger"
-        img_path = person.get("image") or ""
-        if not name or not img_path or not os.path.exists(img_path):
+        if not name or not person.get("image"):
             continue
-        try:
-            mtime = os.path.getmtime(img_path)
-            use_cache = img_path in cache and cache[img_path]["mtime"] == mtime
-            if use_cache:
-                enc = cache[img_path]["encoding"]
-                if HAS_NUMPY and isinstance(enc, np.ndarray) and enc.size == 128:
-                    encodings_list.append(enc)
-                    names_list.append(name)
-                    relations_dict[name] = rel
-                    metadata_dict[name] = img_path
-                else:
-                    use_cache = False
-            if not use_cache:
+        # Extra sample photos (e.g. from a visitor cluster) add more gallery rows for the same name.
+        for img_path in [person.get("image")] + list(person.get("samples") or []):
+            if not img_path or not os.path.exists(img_path):
+                continue
+            try:
+                mtime = os.path.getmtime(img_path)
+            except OSError:
+                continue
+            cached = cache.get(img_path)
+            enc = cached["encoding"] if _cache_entry_valid(cached, img_path, mtime) else None
+            if enc is not None and cached["mtime"] != mtime:
+                cached["mtime"] = mtime  # same content, new mtime (e.g. copied from another device)
+                cache_updated = True
+            if enc is None:
+                if pack is False:
+                    pack = open_gallery_pack(db, backend.name)
+                enc = pack.encoding(image_digest(img_path)) if pack is not None else None
+            if HAS_NUMPY and isinstance(enc, np.ndarray) and enc.size == backend.dim:
+                found[(i, img_path)] = enc
+            else:
+                todo.append((i, img_path, mtime))
+    for start in range(0, len(todo), ENROLL_BATCH):
+        chunk, items = [], []
+        for i, img_path, mtime in todo[start:start + ENROLL_BATCH]:
+            try:
                 image = face_recognition.load_image_file(img_path)
-                encodings = face_recognition.face_encodings(image)
-                if encodings:
-                    enc = encodings[0]
-                    encodings_list.append(enc)
-                    names_list.append(name)
-                    relations_dict[name] = rel
-                    metadata_dict[name] = img_path
-                    cache[img_path] = {"mtime": mtime, "encoding": enc}
-                    cache_updated = True
+                locs = face_recognition.face_locations(image)
+            except Exception:
+                continue
+            chunk.append((i, img_path, mtime))
+            items.append((image, locs))
+        try:
+            outs = batcher.encode_many(items)
         except Exception:
             continue
+        for (i, img_path, mtime), encodings in zip(chunk, outs):
+            if encodings:
+                found[(i, img_path)] = encodings[0]
+                cache[img_path] = {"mtime": mtime, "sha": image_digest(img_path), "encoding": encodings[0]}
+                cache_updated = True
+    for i, person in enumerate(people):
+        name = person.get("name", "").strip()
+        for img_path in [person.get("image")] + list(person.get("samples") or []):
+            if (i, img_path) not in found:
+                continue
+            encodings_list.append(found[(i, img_path)])
+            names_list.append(name)
+            relations_dict[name] = person.get("relation", "").strip() or "Stranger"
+            if img_path == person.get("image"):
+                metadata_dict[name] = img_path
     if cache_updated:
-        valid_paths = {p.get("image") or "" for p in people}
+        valid_paths = {p.get("image") or "" for p in people} | {s for p in people for s in (p.get("samples") or [])}
         pruned = {p: cache[p] for p in cache if p in valid_paths}
-        _save_encodings_cache(pruned)
+        _save_encodings_cache(pruned, backend.name, cache_path)
+    if pack is not False and pack is not None:  # a pack holds no people, so it has len() 0
+        pack.close()
     return encodings_list, names_list, relations_dict, metadata_dict
 
+GALLERY_QUANTIZATION = os.environ.get("MA_GALLERY_QUANT", "none")  # "none", "float16" or "int8"
+GALLERY_RERANK_K = 8        # candidates from the quantized scan re-ranked with exact float32 distances
+GALLERY_SCAN_CHUNK = 4096   # rows dequantized at a time so the working buffer stays cache-sized
+
+class FaceGallery:
+    """Known-face encodings as one contiguous float32 matrix, optionally with a quantized copy for the first-pass scan.
+
+    With quantization the full gallery is scanned in float16 or per-dimension-scaled int8 (2x / 4x less memory
+    traffic than float32), then the best GALLERY_RERANK_K candidates are re-ranked with exact float32 distances.
+    """
+    def __init__(self, encodings, names, quantization=GALLERY_QUANTIZATION, rerank_k=GALLERY_RERANK_K):
+        self.names = list(names)
+        dim = len(encodings[0]) if len(encodings) else 128
+        self.matrix = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(len(self.names), dim))
+        self.quantization = quantization if quantization in ("float16", "int8") else "none"
+        self.rerank_k = max(1, int(rerank_k))
+        self._q = None
+        self._scale = None
+        self._q_sqnorms = None
+        if self.quantization == "float16":
+            self._q = self.matrix.astype(np.float16)
+            self._q_sqnorms = np.einsum("ij,ij->i", self._q.astype(np.float32), self._q.astype(np.float32))
+        elif self.quantization == "int8":
+            scale = np.abs(self.matrix).max(axis=0) / 127.0 if len(self) else np.ones(dim, np.float32)
+            self._scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+            self._q = np.clip(np.rint(self.matrix / self._scale), -127, 127).astype(np.int8)
+            deq = self._q.astype(np.float32) * self._scale
+            self._q_sqnorms = np.einsum("ij,ij->i", deq, deq)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self):
+        """Bytes scanned per query: the quantized copy when present, else the float32 matrix."""
+        return int(self._q.nbytes + self._q_sqnorms.nbytes) if self._q is not None else int(self.matrix.nbytes)
+
+    def distances(self, encoding):
+        """Exact float32 Euclidean distance from encoding to every gallery row."""
+        q = np.asarray(encoding, dtype=np.float32)
+        return np.linalg.norm(self.matrix - q, axis=1)
+
+    def _approx_sq_distances(self, q):
+        """Squared distances against the quantized copy via |x|^2 - 2 x.q + |q|^2, dequantizing one chunk at a time."""
+        n = len(self)
+        dots = np.empty(n, dtype=np.float32)
+        qv = q * self._scale if self._scale is not None else q
+        for start in range(0, n, GALLERY_SCAN_CHUNK):
+            chunk = self._q[start:start + GALLERY_SCAN_CHUNK]
+            dots[start:start + len(chunk)] = chunk.astype(np.float32) @ qv
+        return self._q_sqnorms - 2.0 * dots + float(q @ q)
+
+    def match(self, encoding):
+        """Return (index, exact_distance) of the nearest gallery row, or (None, inf) for an empty gallery."""
+        if not len(self):
+            return None, float("inf")
+        q = np.asarray(encoding, dtype=np.float32)
+        if self._q is None or len(self) <= self.rerank_k:
+            d = self.distances(q)
+            idx = int(np.argmin(d))
+            return idx, float(d[idx])
+        approx = self._approx_sq_distances(q)
+        cand = np.argpartition(approx, self.rerank_k - 1)[:self.rerank_k]
+        exact = np.linalg.norm(self.matrix[cand] - q, axis=1)
+        best = int(np.argmin(exact))
+        return int(cand[best]), float(exact[best])
+
+def benchmark_gallery_quantization(size=100000, queries=500, tolerance=None, seed=0, db=None):
+    """Compare exact and quantized galleries on a synthetic gallery seeded from db's encodings cache
+    (the device-wide cache when db is None).
+
+    Reports scanned bytes, mean query time, and how often the match decision at `tolerance`
+    (name or Unknown) differs from the exact float32 scan.
+    """
+    backend = get_embedding_backend()
+    tolerance = backend.threshold if tolerance is None else tolerance
+    rng = np.random.default_rng(seed)
+    seeds = [np.asarray(v["encoding"], dtype=np.float32) for v in _load_encodings_cache(backend.name, encodings_cache_path(db)).values()]
+    center = np.mean(seeds, axis=0) if seeds else np.zeros(128, np.float32)
+    spread = float(np.std(seeds)) if len(seeds) > 1 else 0.09
+    gallery = (center + rng.normal(0, spread, (size, 128))).astype(np.float32)
+    names = [f"person_{i}" for i in range(size)]
+    # Half the queries are noisy re-captures of enrolled people, half are strangers.
+    members = rng.integers(0, size, queries // 2)
+    noise = rng.normal(0, 1, (len(members), 128)).astype(np.float32)
+    noise *= (0.3 / np.linalg.norm(noise, axis=1, keepdims=True))
+    probes = np.vstack([gallery[members] + noise,
+                        (center + rng.normal(0, spread, (queries - len(members), 128))).astype(np.float32)])
+    results = []
+    reference = None
+    for mode in ("none", "float16", "int8"):
+        g = FaceGallery(gallery, names, quantization=mode)
+        decisions, dists = [], []
+        t0 = time.perf_counter()
+        for p in probes:
+            idx, dist = g.match(p)
+            decisions.append(idx if dist < tolerance else -1)
+            dists.append(dist)
+        elapsed = (time.perf_counter() - t0) / len(probes)
+        if reference is None:
+            reference = (decisions, dists)
+        mismatches = sum(1 for a, b in zip(decisions, reference[0]) if a != b)
+        max_err = max(abs(a - b) for a, b in zip(dists, reference[1]))
+        results.append({"mode": mode, "bytes": g.nbytes, "ms_per_query": elapsed * 1000.0,
+                        "decision_mismatch": mismatches / len(probes), "max_distance_error": max_err})
+    return results
+
+CAPTURE_RESERVOIR_SIZE = 3   # best crops kept per stranger while capturing
+QUALITY_SAMPLE_SIZE = 64     # crops are scored on a fixed-size grey thumbnail so scores are comparable
+SHARPNESS_REF = 150.0        # Laplacian variance treated as "fully sharp"
+FACE_AREA_REF = 120 * 120    # crop area (full-res pixels) treated as "large enough"
+
+def _laplacian_variance(gray):
+    """Sharpness of a grey image: variance of its Laplacian (higher = sharper)."""
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+def _frontalness(gray):
+    """0..1 left/right symmetry of a grey face crop; turned faces are less symmetric."""
+    half = gray.shape[1] // 2
+    if half < 2:
+        return 0.0
+    left = gray[:, :half].astype(np.float32)
+    right = cv2.flip(gray[:, -half:], 1).astype(np.float32)
+    return max(0.0, 1.0 - 4.0 * float(np.mean(np.abs(left - right))) / 255.0)
+
+def score_face_crop(crop):
+    """Quality score 0..1 for a BGR face crop from sharpness, size and frontalness."""
+    if crop is None or crop.size == 0:
+        return 0.0
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    sample = cv2.resize(gray, (QUALITY_SAMPLE_SIZE, QUALITY_SAMPLE_SIZE), interpolation=cv2.INTER_AREA)
+    sharp = min(1.0, _laplacian_variance(sample) / SHARPNESS_REF)
+    size = min(1.0, (crop.shape[0] * crop.shape[1]) / FACE_AREA_REF)
+    return 0.5 * sharp + 0.25 * size + 0.25 * _frontalness(sample)
+
+QUALITY_GATE = float(os.environ.get("MA_QUALITY_GATE", "0.45"))  # faces scoring below this are not encoded; 0 disables
+QUALITY_MIN_FACE_PX = 36     # faces narrower than this (full-res pixels) are never encoded
+QUALITY_GOOD_FACE_PX = 96    # faces this wide or wider get the full size score
+QUALITY_GATE_SAMPLE = 32     # detection-frame crops are scored for blur at this size
+QUALITY_BLUR_REF = 60.0      # Laplacian variance of a QUALITY_GATE_SAMPLE crop treated as "sharp"
+
+def face_quality(gray_small, loc, scale, landmarks=None):
+    """Cheap quality check of a detected face on the grey detection frame. Returns (score 0..1, weakest aspect).
+
+    loc is the (t, r, b, l) box in gray_small and scale the detection downscale. Faces that are too small or
+    touch the frame edge (partly out of view) score 0. Otherwise the score mixes size, sharpness (Laplacian
+    variance) and pose: the nose's offset between the eyes from 5-point landmarks, or left/right symmetry without.
+    """
+    t, r, b, l = loc
+    h, w = gray_small.shape[:2]
+    side = min(b - t, r - l) / scale
+    if side < QUALITY_MIN_FACE_PX:
+        return 0.0, "small"
+    if min(t, l) <= 0 or b >= h or r >= w:
+        return 0.0, "clipped"
+    sample = cv2.resize(gray_small[t:b, l:r], (QUALITY_GATE_SAMPLE, QUALITY_GATE_SAMPLE), interpolation=cv2.INTER_AREA)
+    parts = {"small": min(1.0, (side - QUALITY_MIN_FACE_PX) / (QUALITY_GOOD_FACE_PX - QUALITY_MIN_FACE_PX)),
+             "blurred": min(1.0, _laplacian_variance(sample) / QUALITY_BLUR_REF)}
+    try:
+        left = np.mean(landmarks["left_eye"], axis=0)[0]
+        right = np.mean(landmarks["right_eye"], axis=0)[0]
+        ratio = (landmarks["nose_tip"][0][0] - left) / (right - left)
+        parts["turned"] = max(0.0, 1.0 - 2.5 * abs(ratio - 0.5))  # ratio 0.5 = nose midway between the eyes
+    except (TypeError, KeyError, IndexError, ZeroDivisionError):
+        parts["turned"] = _frontalness(sample)
+    score = parts["small"] ** 0.2 * parts["blurred"] ** 0.5 * parts["turned"] ** 0.3  # one bad aspect is enough to fail
+    return float(score), min(parts, key=parts.get)
+
+class CaptureReservoir:
+    """Fixed-capacity buffer that keeps only the best-scoring crops offered to it (memory is constant per stranger)."""
+    def __init__(self, capacity=CAPTURE_RESERVOIR_SIZE):
+        self.capacity = max(1, int(capacity))
+        self._heap = []  # min-heap of (score, seq, crop); worst kept crop at the top
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def offer(self, crop):
+        """Score a crop and keep a copy only if it beats the worst kept one. Returns the score."""
+        if crop is None or crop.size == 0:
+            return 0.0
+        score = score_face_crop(crop)
+        if len(self._heap) < self.capacity:
+            heapq.heappush(self._heap, (score, next(self._seq), crop.copy()))
+        elif score > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (score, next(self._seq), crop.copy()))
+        return score
+
+    def best(self):
+        """Highest-scoring crop kept so far, or None."""
+        return max(self._heap, key=lambda item: item[0])[2] if self._heap else None
+
+    def ranked(self):
+        """Kept crops, best first."""
+        return [item[2] for item in sorted(self._heap, key=lambda item: item[0], reverse=True)]
+
+    def clear(self):
+        self._heap = []
+
 def is_valid_email(email):
     if not email or len(email) > 254:
         return False
@@ -119,6 +979,184 @@ def is_valid_password(password):
     has_digit = any(c.isdigit() for c in password)
     return has_letter and has_digit
 
+# ---------------- PEOPLE SEARCH ----------------
+SEARCH_DEBOUNCE_MS = 150
+SEARCH_LIMIT = 50            # rows rendered on the Detected page at most
+SEARCH_FUZZY_MIN_SIM = 0.4   # trigram Jaccard similarity for a typo-tolerant match
+SEARCH_PREFIX_CACHE = 2      # prefixes up to this length keep their token set, so short queries skip the trie walk
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def _tokens(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t]
+
+def _trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class PeopleIndex:
+    """In-memory search over name, relation and notes, updated incrementally as people change.
+
+    Indexes the vocabulary, not the documents: a prefix trie over distinct tokens for search-as-you-type,
+    a trigram index over the same tokens for typo-tolerant matches, and token -> person-id postings.
+    A query is answered from its most selective term; the other terms are checked against each candidate's
+    own tokens, so work stays proportional to the matches rather than to the number of people.
+    """
+    FIELD_WEIGHT = {"name": 3.0, "rel": 2.0, "notes": 1.0}
+
+    def __init__(self, people=()):
+        self.people = {}      # id -> person dict
+        self._docs = {}       # id -> {"name": [...], "rel": [...], "notes": [...]}
+        self._postings = {}   # token -> {field: set of ids}
+        self._trie = {}       # nested dicts; the key "" marks the end of a token
+        self._grams = collections.defaultdict(set)  # trigram -> tokens
+        self._gram_count = {}  # token -> number of trigrams
+        self._short = collections.defaultdict(set)  # prefix of length <= SEARCH_PREFIX_CACHE -> tokens
+        for p in people:
+            self.add(p)
+
+    def __len__(self):
+        return len(self.people)
+
+    def _add_token(self, token, field, pid):
+        fields = self._postings.get(token)
+        if fields is None:
+            fields = self._postings[token] = {}
+            node = self._trie
+            for ch in token:
+                node = node.setdefault(ch, {})
+            node[""] = token
+            grams = _trigrams(token)
+            self._gram_count[token] = len(grams)
+            for g in grams:
+                self._grams[g].add(token)
+            for n in range(1, min(len(token), SEARCH_PREFIX_CACHE) + 1):
+                self._short[token[:n]].add(token)
+        fields.setdefault(field, set()).add(pid)
+
+    def _remove_token(self, token, field, pid):
+        fields = self._postings.get(token)
+        if fields is None or field not in fields:
+            return
+        fields[field].discard(pid)
+        if not fields[field]:
+            del fields[field]
+        if fields:
+            return
+        del self._postings[token]
+        path, node = [], self._trie
+        for ch in token:
+            path.append((node, ch))
+            node = node[ch]
+        node.pop("", None)
+        for parent, ch in reversed(path):  # prune branches that no longer lead to any token
+            if parent[ch]:
+                break
+            del parent[ch]
+        del self._gram_count[token]
+        for g in _trigrams(token):
+            self._grams[g].discard(token)
+            if not self._grams[g]:
+                del self._grams[g]
+        for n in range(1, min(len(token), SEARCH_PREFIX_CACHE) + 1):
+            self._short[token[:n]].discard(token)
+            if not self._short[token[:n]]:
+                del self._short[token[:n]]
+
+    def add(self, person):
+        """Index a new person, or re-index an edited one."""
+        pid = person.get("id")
+        if not pid:
+            return
+        if pid in self._docs:
+            self.remove(pid)
+        doc = {"name": set(_tokens(person.get("name"))), "rel": set(_tokens(person.get("relation"))),
+               "notes": set(_tokens(person.get("notes")))}
+        self.people[pid] = person
+        self._docs[pid] = doc
+        for field, tokens in doc.items():
+            for token in tokens:
+                self._add_token(token, field, pid)
+
+    update = add
+
+    def remove(self, pid):
+        doc = self._docs.pop(pid, None)
+        self.people.pop(pid, None)
+        if doc:
+            for field, tokens in doc.items():
+                for token in tokens:
+                    self._remove_token(token, field, pid)
+
+    def _prefix_tokens(self, prefix):
+        if len(prefix) <= SEARCH_PREFIX_CACHE:
+            return self._short.get(prefix, ())
+        node = self._trie
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        out, stack = [], [node]
+        while stack:
+            node = stack.pop()
+            for k, child in node.items():
+                if k == "":
+                    out.append(child)
+                else:
+                    stack.append(child)
+        return out
+
+    def _fuzzy_tokens(self, term):
+        grams = _trigrams(term)
+        shared = collections.Counter()
+        for g in grams:
+            for token in self._grams.get(g, ()):
+                shared[token] += 1
+        count = self._gram_count
+        return [t for t, n in shared.items() if n >= SEARCH_FUZZY_MIN_SIM * (len(grams) + count[t] - n)]
+
+    def _term_matches(self, term, within=None):
+        """{field: ids} for one query term from prefix matches, else (typo tolerance) fuzzy matches.
+        With `within`, postings are intersected with it first so later terms never build large unions."""
+        tokens = self._prefix_tokens(term)
+        if not tokens and len(term) >= 3:
+            tokens = self._fuzzy_tokens(term)
+        by_field = {field: set() for field in self.FIELD_WEIGHT}
+        for t in tokens:
+            for field, ids in self._postings[t].items():
+                by_field[field] |= ids if within is None else ids & within
+        return by_field
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Returns (matching people, best first, at most limit; total number of matches)."""
+        terms = _tokens(query)
+        if not terms:
+            return list(self.people.values())[:limit], len(self.people)
+        terms.sort(key=len, reverse=True)  # longest term is usually the most selective
+        per_term, ids = [], None
+        for term in terms:
+            by_field = self._term_matches(term, ids)
+            hits = set().union(*by_field.values())
+            ids = hits if ids is None else ids & hits
+            per_term.append(by_field)
+            if not ids:
+                return [], 0
+        total = len(ids)
+        if total > limit * 40:
+            # Too many to score individually (e.g. a one-letter prefix): take name matches first, then relation, then notes.
+            picked = []
+            for field in self.FIELD_WEIGHT:
+                for pid in per_term[0][field] & ids:
+                    if len(picked) == limit:
+                        break
+                    if pid not in picked:
+                        picked.append(pid)
+        else:
+            def score(pid):
+                return sum(max((w for field, w in self.FIELD_WEIGHT.items() if pid in by_field[field]), default=0.0)
+                           for by_field in per_term)
+            picked = heapq.nlargest(limit, ids, key=score)
+        return [self.people[pid] for pid in picked], total
+
 # ---------------- BUTTON STYLE ----------------
 def btn(parent,text,cmd,w=200):
     return ctk.CTkButton(
@@ -139,17 +1177,56 @@ class App(ctk.CTk):
         self.configure(fg_color="black")
         self.title("MindMenders")
 
-        self.db=load_db()
+        self.db={"people":[]}  # the signed-in user's shard; nothing is loaded until someone signs in
+        self.user=None
         self.user_name=""
+        self.sightings=UnknownSightingStore()
+        self.sighting_log=SightingLog()
+        self.people_index=PeopleIndex(self.db.get("people", []))
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.memprofiler=None
+        if MEMPROFILE:
+            self.memprofiler=MemoryProfiler(tk_root=self).start()
+            self.after(int(MEMPROFILE_INTERVAL_SEC*1000), self._memprofile_tick)
 
         self.frames={}
-        for F in (Splash,Login,Home,AddPerson,Detected,ProfileView,EditProfile,MemoryAssistant):
+        for F in (Splash,Login,Home,AddPerson,Detected,ProfileView,EditProfile,MemoryAssistant,Visitors):
             frame=F(self)
             self.frames[F]=frame
             frame.place(relwidth=1,relheight=1)
 
         self.show(Splash)
 
+    def _on_close(self):
+        self.sighting_log.close()
+        self.destroy()
+
+    def sign_in(self,user,password=None):
+        """Load only this user's shard: people, search index, stranger sightings and recognition gallery. The previous
+        user's are dropped. password is only passed on to a recognition daemon serving another account."""
+        self.user=user
+        self.db=load_db(user["id"])
+        self.people_index=PeopleIndex(self.db.get("people", []))
+        self.sightings=unknown_sighting_store(user["id"])
+        self.frames[MemoryAssistant].switch_user(password)
+
+    def save(self):
+        """Save the shard. If the recognition service added, edited or removed people meanwhile, they are
+        merged into self.db by save_db, and the search index is rebuilt to match."""
+        if save_db(self.db):
+            self.people_index=PeopleIndex(self.db.get("people", []))
+
+    def sign_out(self):
+        self.user=None
+        self.db={"people":[]}
+        self.people_index=PeopleIndex([])
+        self.sightings=UnknownSightingStore()
+        self.frames[MemoryAssistant].switch_user()
+
+    def _memprofile_tick(self):
+        self.memprofiler.sample()
+        self.after(int(MEMPROFILE_INTERVAL_SEC*1000), self._memprofile_tick)
+
     def show(self,page):
         self.frames[page].tkraise()
         if hasattr(self.frames[page], "on_show"):
@@ -208,7 +1285,14 @@ class Login(ctk.CTkFrame):
                 "Password must be at least 8 characters and contain both letters and numbers."
             )
             return
-        self.app.user_name = self.name.get().strip()
+        try:
+            user = sign_in(self.name.get().strip(), email, password)
+        except ValueError as e:
+            messagebox.showerror("Sign In", str(e))
+            return
+        self.password.delete(0, "end")
+        self.app.sign_in(user, password)
+        self.app.user_name = self.name.get().strip() or user.get("name") or user["email"]
         self.app.frames[Home].update_name()
         self.app.show(Home)
 
@@ -233,9 +1317,12 @@ class Home(ctk.CTkFrame):
 
         btn(box,"Memory Assistant",lambda: self.app.show(MemoryAssistant),320).pack(pady=15)
 
+        btn(box,"Recurring Visitors",lambda: self.app.show(Visitors),320).pack(pady=15)
+
         btn(box,"Sign out",self.sign_out,200).pack(pady=20)
 
     def sign_out(self):
+        self.app.sign_out()
         self.app.user_name = ""
         self.app.show(Login)
 
@@ -370,10 +1457,11 @@ class AddPerson(ctk.CTkFrame):
             messagebox.showerror("Camera", "Could not capture frame.")
             return
         frame = cv2.flip(frame, 1)
-        if not os.path.exists(IMAGE_FOLDER):
-            os.makedirs(IMAGE_FOLDER)
-        path = f"{IMAGE_FOLDER}/cam_{int(time.time())}.jpg"
-        cv2.imwrite(path, frame)
+        try:
+            path = ingest_image(frame)
+        except (OSError, ValueError):
+            messagebox.showerror("Camera", "Could not save the captured photo.")
+            return
         self.image_path = path
         self.cap.release()
         self.cap = None
@@ -388,8 +1476,12 @@ class AddPerson(ctk.CTkFrame):
         file=filedialog.askopenfilename(
             filetypes=[("Images","*.png *.jpg *.jpeg")])
         if file:
-            self.image_path=file
-            pil_img=Image.open(file).convert("RGB").resize((520,340))
+            try:
+                self.image_path=ingest_image(file)
+            except (OSError, ValueError):
+                messagebox.showerror("Upload", "Could not read that image.")
+                return
+            pil_img=Image.open(self.image_path).convert("RGB").resize((520,340))
             photo=ctk.CTkImage(light_image=pil_img,size=(520,340))
             self.video.configure(image=photo,text="")
             self.video.image=photo
@@ -403,13 +1495,15 @@ class AddPerson(ctk.CTkFrame):
         if not self.image_path or not os.path.exists(self.image_path):
             messagebox.showwarning("Save", "Please add a photo (camera or upload).")
             return
-        self.app.db["people"].append({
+        person = {
             "name": name,
             "relation": self.relation.get().strip(),
             "notes": self.notes.get("1.0", "end").strip(),
             "image": self.image_path
-        })
-        save_db(self.app.db)
+        }
+        self.app.db["people"].append(person)
+        self.app.save()
+        self.app.people_index.add(person)
         self.app.show(Detected)
         self.app.frames[Detected].refresh()
 
@@ -422,16 +1516,34 @@ class Detected(ctk.CTkFrame):
         btn(self,"← Back",lambda: self.app.show(Home),140)\
             .pack(anchor="nw",padx=20,pady=20)
 
+        search_row=ctk.CTkFrame(self,fg_color="black")
+        search_row.pack(fill="x",padx=40)
+        self.search=ctk.CTkEntry(search_row,width=420,height=40,placeholder_text="Search name, relation or notes")
+        self.search.pack(side="left")
+        self.search.bind("<KeyRelease>",self._on_search_key)
+        self.count_label=ctk.CTkLabel(search_row,text="",font=ctk.CTkFont(size=12),text_color="#888")
+        self.count_label.pack(side="left",padx=12)
+        self._search_job=None
+
         self.scroll=ctk.CTkScrollableFrame(self)
         self.scroll.pack(expand=True,fill="both",padx=40,pady=20)
 
     def on_show(self):
         self.refresh()
 
+    def _on_search_key(self, event=None):
+        """Debounce: search once typing pauses for SEARCH_DEBOUNCE_MS."""
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job=self.after(SEARCH_DEBOUNCE_MS,self.refresh)
+
     def refresh(self):
+        self._search_job=None
         for w in self.scroll.winfo_children():
             w.destroy()
-        people = self.app.db.get("people", [])
+        # Only the matching rows (at most SEARCH_LIMIT) are built; widgets, not the search, are the slow part.
+        people, total = self.app.people_index.search(self.search.get())
+        self.count_label.configure(text=f"Showing {len(people)} of {total}" if total > len(people) else f"{total} found")
         def make_open_cmd(p):
             def _open():
                 self.open_profile(p)
@@ -502,7 +1614,12 @@ class ProfileView(ctk.CTkFrame):
 
         ctk.CTkLabel(self, text="Bio", font=ctk.CTkFont(size=14), text_color="#888").pack(pady=(0, 4))
         self.notes=ctk.CTkLabel(self,wraplength=620,font=ctk.CTkFont(size=18))
-        self.notes.pack(pady=(0, 20))
+        self.notes.pack(pady=(0, 12))
+
+        self.last_seen=ctk.CTkLabel(self,font=ctk.CTkFont(size=14),text_color="#aaa")
+        self.last_seen.pack(pady=(0, 2))
+        self.history=ctk.CTkLabel(self,font=ctk.CTkFont(size=12),text_color="#777",justify="center")
+        self.history.pack(pady=(0, 12))
 
         row=ctk.CTkFrame(self,fg_color="black")
         row.pack(pady=15)
@@ -530,6 +1647,29 @@ class ProfileView(ctk.CTkFrame):
         self.name.configure(text=person.get("name", ""))
         self.rel.configure(text=person.get("relation", ""))
         self.notes.configure(text=person.get("notes", ""))
+        self._show_sightings(person)
+
+    def _show_sightings(self, person):
+        """Last seen and per-day visits from the sighting log (indexed lookups, cheap on every open)."""
+        pid = person.get("id")
+        ts, source = self.app.sighting_log.last_seen(pid) if pid else (None, None)
+        if ts is None:
+            self.last_seen.configure(text="Not seen by the Memory Assistant yet")
+            self.history.configure(text="")
+            return
+        ago = time.time() - ts
+        if ago < 60:
+            when = "just now"
+        elif ago < 3600:
+            when = f"{int(ago // 60)} min ago"
+        elif ago < 86400:
+            when = f"{int(ago // 3600)} h ago"
+        else:
+            when = time.strftime("%d %b %Y %H:%M", time.localtime(ts))
+        self.last_seen.configure(text=f"Last seen {when} · {source}")
+        lines = [f"{time.strftime('%a %d %b', time.localtime(day_ts))}: {visits} visit{'s' if visits != 1 else ''}, {int(secs // 60)} min"
+                 for day_ts, visits, secs in self.app.sighting_log.daily_rollup(pid, 7)]
+        self.history.configure(text="\n".join(lines))
 
     def edit(self):
         self.app.frames[EditProfile].load(self.person)
@@ -542,7 +1682,8 @@ class ProfileView(ctk.CTkFrame):
             self.app.db["people"].remove(self.person)
         except ValueError:
             pass
-        save_db(self.app.db)
+        self.app.save()
+        self.app.people_index.remove(self.person.get("id"))
         self.app.frames[Detected].refresh()
         self.app.show(Detected)
 
@@ -614,10 +1755,11 @@ class _CapturePhotoDialog(ctk.CTkToplevel):
         if not ret:
             return
         frame = cv2.flip(frame, 1)
-        if not os.path.exists(IMAGE_FOLDER):
-            os.makedirs(IMAGE_FOLDER)
-        path = f"{IMAGE_FOLDER}/edit_cam_{int(time.time())}.jpg"
-        cv2.imwrite(path, frame)
+        try:
+            path = ingest_image(frame)
+        except (OSError, ValueError):
+            messagebox.showerror("Camera", "Could not save the captured photo.")
+            return
         self.edit_profile_frame.person["image"] = path
         self.edit_profile_frame._show_photo()
         self._close()
@@ -685,7 +1827,11 @@ class EditProfile(ctk.CTkFrame):
         file = filedialog.askopenfilename(filetypes=[("Images", "*.png *.jpg *.jpeg")])
         if not file:
             return
-        self.person["image"] = file
+        try:
+            self.person["image"] = ingest_image(file)
+        except (OSError, ValueError):
+            messagebox.showerror("Upload", "Could not read that image.")
+            return
         self._show_photo()
 
     def capture_photo(self):
@@ -696,46 +1842,1150 @@ class EditProfile(ctk.CTkFrame):
         self.person["name"]=self.name.get().strip()
         self.person["relation"]=self.rel.get().strip()
         self.person["notes"]=self.notes.get("1.0","end").strip()
-        save_db(self.app.db)
+        self.app.save()
+        self.app.people_index.update(self.person)
         messagebox.showinfo("Saved","Profile Updated")
         self.app.frames[ProfileView].load(self.person)
         self.app.show(ProfileView)
 
 
 # ---------------- MEMORY ASSISTANT (Live face recognition + voice) ----------------
-RECOGNITION_TOLERANCE = 0.4
 TRIGGER_THRESHOLD = 8
 SAVE_DURATION = 5
 PENDING_REGISTRATION_TIMEOUT_SEC = 300  # 5 minutes; auto-cancel if nothing done
 MA_VIDEO_SIZE = (800, 500)
+MA_THUMB_CACHE = 32  # sidebar thumbnails of known people kept between sidebar rebuilds
+MA_SOURCES = os.environ.get("MA_SOURCES", "0")  # comma-separated camera indices and/or video file paths
+# Recognition worker threads shared by all sources; 0 runs recognition on the Tk thread (default on macOS,
+# where cross-thread OpenCV/numpy has crashed before).
+MA_WORKERS = int(os.environ.get("MA_WORKERS", "0" if platform.system() == "Darwin" else "2"))
+
+def parse_sources(spec):
+    """'0,1,entrance.mp4' -> [0, 1, 'entrance.mp4']. Camera indices become ints, everything else is a file path."""
+    sources = []
+    for part in str(spec).split(","):
+        part = part.strip()
+        if part:
+            sources.append(int(part) if part.isdigit() else part)
+    return sources or [0]
+
+SYNTHETIC_FRAME_SIZE = (640, 480)
+SYNTHETIC_CYCLE_SEC = 60     # the synthetic face is in view for the first SYNTHETIC_PRESENT_SEC of every cycle
+SYNTHETIC_PRESENT_SEC = 35
+
+class SyntheticCapture:
+    """Endless camera stand-in for soak tests ("synthetic" or "synthetic:face.jpg" in MA_SOURCES).
+
+    A face photo drifts across a dim, slightly noisy background, then leaves for the rest of each cycle, so long
+    runs keep exercising detection, tracking, stranger capture and the motion-gated idle mode.
+    """
+    def __init__(self, face_path=None, size=SYNTHETIC_FRAME_SIZE):
+        self.size = size
+        self._rng = np.random.default_rng(0)
+        self._bg = np.full((size[1], size[0], 3), 60, np.uint8)
+        self._face = None
+        img = cv2.imread(face_path) if face_path else None
+        if img is not None:
+            scale = (size[1] * 0.45) / max(img.shape[:2])
+            self._face = cv2.resize(img, (0, 0), fx=scale, fy=scale)
+        self._started = time.time()
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        t = time.time() - self._started
+        frame = self._bg + self._rng.integers(0, 3, self._bg.shape, dtype=np.uint8)
+        if self._face is not None and t % SYNTHETIC_CYCLE_SEC < SYNTHETIC_PRESENT_SEC:
+            fh, fw = self._face.shape[:2]
+            x = int((self.size[0] - fw) * (0.5 + 0.4 * math.sin(t / 4.0)))
+            y = int((self.size[1] - fh) * (0.5 + 0.3 * math.cos(t / 5.0)))
+            frame[y:y + fh, x:x + fw] = self._face
+        return True, frame
+
+    def release(self):
+        pass
+
+def is_file_source(source):
+    """Video files are read at the pool's pace and never gated; camera indices and synthetic sources are live."""
+    return isinstance(source, str) and not source.startswith("synthetic")
+
+def source_label(source):
+    if isinstance(source, str) and source.startswith("synthetic"):
+        return "Synthetic"
+    return f"Camera {source}" if isinstance(source, int) else os.path.basename(source)
+
+def open_capture(source):
+    """Open a camera index with the platform's preferred backend, or a video file. Returns None on failure."""
+    if isinstance(source, str) and source.startswith("synthetic"):
+        return SyntheticCapture(source.partition(":")[2] or None)
+    if isinstance(source, str):
+        cap = cv2.VideoCapture(source)
+        if cap.isOpened():
+            return cap
+        cap.release()
+        return None
+    if platform.system() == "Darwin":
+        backends = [getattr(cv2, "CAP_AVFOUNDATION", cv2.CAP_ANY), cv2.CAP_ANY]
+    elif platform.system() == "Windows":
+        backends = [getattr(cv2, "CAP_DSHOW", cv2.CAP_ANY), cv2.CAP_ANY]
+    else:
+        backends = [cv2.CAP_ANY, getattr(cv2, "CAP_V4L2", cv2.CAP_ANY)]
+    for backend in backends:
+        cap = cv2.VideoCapture(source, backend)
+        if cap.isOpened():
+            # Warm up: discard first few frames (often dark or invalid)
+            for _ in range(5):
+                cap.read()
+            return cap
+        cap.release()
+    return None
+
+TRACK_MATCH_DIST = 100          # full-res pixels a face centre may move between frames and keep its track
+IDENTITY_VOTE_WINDOW = 7        # recent per-frame matches each track votes over
+IDENTITY_SWITCH_VOTES = 4       # votes a different identity needs in the window before the label changes
+IDENTITY_STABLE_SHARE = 0.8     # vote share at which a track counts as settled
+IDENTITY_REVERIFY_SEC = 1.0     # settled tracks skip encoding until this long after their last agreeing vote
+IDENTITY_TRACK_TTL_SEC = 1.5    # tracks not seen for this long are forgotten
+
+class IdentityTracker:
+    """Face tracks for one stream, with windowed identity voting and hysteresis.
+
+    Each track keeps its last IDENTITY_VOTE_WINDOW matches (a name, or None for Unknown). The displayed
+    identity only changes when another one collects IDENTITY_SWITCH_VOTES and outvotes it, so a single bad
+    frame no longer flips a person to "Unknown". Settled tracks are only re-encoded every IDENTITY_REVERIFY_SEC.
+    """
+    def __init__(self):
+        self.tracks = {}  # track id -> {"box", "votes", "identity", "decided", "verified_at", "last_seen", "encoding"}
+        self._next_id = 0
+
+    def assign(self, boxes, now):
+        """Match full-res (t, r, b, l) boxes to tracks by nearest centre; returns one track id per box."""
+        for tid in [tid for tid, tr in self.tracks.items() if now - tr["last_seen"] > IDENTITY_TRACK_TTL_SEC]:
+            del self.tracks[tid]
+        pairs = []
+        for i, (t, r, b, l) in enumerate(boxes):
+            for tid, tr in self.tracks.items():
+                pt, pr, pb, pl = tr["box"]
+                d = math.hypot((t + b - pt - pb) / 2, (l + r - pl - pr) / 2)
+                if d < TRACK_MATCH_DIST:
+                    pairs.append((d, i, tid))
+        ids, used = [None] * len(boxes), set()
+        for d, i, tid in sorted(pairs):
+            if ids[i] is None and tid not in used:
+                ids[i] = tid
+                used.add(tid)
+        for i, box in enumerate(boxes):
+            if ids[i] is None:
+                ids[i] = self._next_id
+                self._next_id += 1
+                self.tracks[ids[i]] = {"box": box, "votes": collections.deque(maxlen=IDENTITY_VOTE_WINDOW),
+                                       "identity": None, "decided": False, "verified_at": 0.0,
+                                       "last_seen": now, "encoding": None}
+            tr = self.tracks[ids[i]]
+            tr["box"] = box
+            tr["last_seen"] = now
+        return ids
+
+    def needs_encoding(self, tid, now):
+        """False while the track is settled and was confirmed recently, so the encoder can be skipped."""
+        tr = self.tracks[tid]
+        votes = tr["votes"]
+        if not tr["decided"] or len(votes) < votes.maxlen:
+            return True
+        if sum(1 for v in votes if v == tr["identity"]) / len(votes) < IDENTITY_STABLE_SHARE:
+            return True
+        return now - tr["verified_at"] >= IDENTITY_REVERIFY_SEC
+
+    def vote(self, tid, name, now, encoding=None):
+        tr = self.tracks[tid]
+        tr["votes"].append(name)
+        if encoding is not None:
+            tr["encoding"] = encoding
+        if not tr["decided"]:
+            tr["identity"], tr["decided"] = name, True
+        elif name != tr["identity"]:
+            counts = collections.Counter(tr["votes"])
+            if counts[name] >= IDENTITY_SWITCH_VOTES and counts[name] > counts[tr["identity"]]:
+                tr["identity"] = name
+        if name == tr["identity"]:
+            tr["verified_at"] = now
+
+    def identity(self, tid):
+        return self.tracks[tid]["identity"]
+
+    def confidence(self, tid):
+        """Share of the track's recent votes that agree with its identity (0-1)."""
+        tr = self.tracks[tid]
+        return tr["votes"].count(tr["identity"]) / len(tr["votes"]) if tr["votes"] else 0.0
+
+MOTION_SAMPLE_SIZE = (64, 48)  # frames are compared for motion at this size (width, height)
+MOTION_PIXEL_DELTA = 18         # grey-level change from the background for a pixel to count as moving
+MOTION_MIN_FRACTION = 0.004     # share of moving pixels that counts as motion (~12 of 3072)
+MOTION_BG_RATE = 0.05           # background running-average rate; absorbs slow lighting changes
+IDLE_AFTER_SEC = 10             # static, with no tracked faces, for this long -> camera goes idle
+IDLE_CAPTURE_MS = 200           # capture interval while every camera is idle (30 ms when active)
+IDLE_HEARTBEAT_SEC = 5          # idle cameras still run detection this often, for someone sitting perfectly still
+
+class MotionGate:
+    """Per-camera scene-change gate deciding which frames need face detection.
+
+    Frames are shrunk to MOTION_SAMPLE_SIZE, blurred and compared with a running-average background, which
+    costs a fraction of a millisecond. After IDLE_AFTER_SEC without motion or tracked faces the camera is idle:
+    it is read every IDLE_CAPTURE_MS and only every IDLE_HEARTBEAT_SEC goes through detection, until motion wakes it.
+    """
+    def __init__(self, idle_after=IDLE_AFTER_SEC, heartbeat=IDLE_HEARTBEAT_SEC):
+        self.idle_after = idle_after
+        self.heartbeat = heartbeat
+        self.idle = False
+        self._bg = None
+        self._last_motion = None
+        self._last_detect = 0.0
+        self._last_frame_at = None
+        self._idle_since = None
+        self.woke_at = None  # time of the last static frame before a wake-up, until its first result arrives
+        self._wake_base = 0  # results already processed for this camera when it woke
+        self.stats = {"wakeups": 0, "idle_sec": 0.0, "skipped": 0, "wake_ms": None}
+
+    def motion(self, frame):
+        small = cv2.resize(frame, MOTION_SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0).astype(np.float32)
+        if self._bg is None:
+            self._bg = gray
+            return True
+        moving = np.count_nonzero(cv2.absdiff(gray, self._bg) > MOTION_PIXEL_DELTA)
+        cv2.accumulateWeighted(gray, self._bg, MOTION_BG_RATE)
+        return moving >= MOTION_MIN_FRACTION * gray.size
+
+    def should_detect(self, frame, has_tracks, now=None, processed=0):
+        """Feed one frame; True if it should go through detection. processed: results produced so far for this camera."""
+        now = time.time() if now is None else now
+        prev_frame_at, self._last_frame_at = self._last_frame_at, now
+        if self.motion(frame) or has_tracks or self._last_motion is None:
+            self._last_motion = now
+            if self.idle:
+                self.idle = False
+                self.stats["wakeups"] += 1
+                self.stats["idle_sec"] += now - self._idle_since
+                # Motion began somewhere after the previous (static) frame, so latency is measured from there.
+                self.woke_at = prev_frame_at if prev_frame_at is not None else now
+                self._wake_base = processed
+        elif not self.idle and now - self._last_motion >= self.idle_after:
+            self.idle = True
+            self._idle_since = now
+        if self.idle and now - self._last_detect < self.heartbeat:
+            self.stats["skipped"] += 1
+            return False
+        self._last_detect = now
+        return True
+
+    def result_arrived(self, processed, at):
+        """Report the camera's result count and latest result time; the first result after a wake-up sets wake_ms."""
+        if self.woke_at is not None and processed > self._wake_base and at is not None:
+            self.stats["wake_ms"] = 1000.0 * (at - self.woke_at)
+            self.woke_at = None
+
+def benchmark_motion_gate(path, limit=None):
+    """Replay a video as if it were a live camera, without and with the motion gate.
+
+    Frames are timestamped at the file's frame rate. While idle, only one frame per IDLE_CAPTURE_MS is decoded,
+    as the capture loop does. Wake latency is the time since the previous (static) frame read plus the
+    detection time. Returns one dict per mode: cpu_sec, frames, detections, wakeups, idle_sec, wake_ms.
+    """
+    results = []
+    for gated in (False, True):
+        cap = cv2.VideoCapture(path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        pipeline, gate = RecognitionPipeline(), MotionGate()
+        n = frames = detections = 0
+        next_read, wake_ms = 0.0, []
+        cpu0 = time.process_time()
+        while limit is None or n < limit:
+            ts = n / fps
+            n += 1
+            if gated and ts < next_read:
+                if not cap.grab():
+                    break
+                continue
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames += 1
+            was_idle = gate.idle
+            if gated and not gate.should_detect(frame, pipeline.has_tracks(0), ts):
+                next_read = ts + IDLE_CAPTURE_MS / 1000.0
+                continue
+            t0 = time.perf_counter()
+            pipeline.process(0, frame)
+            detections += 1
+            if was_idle and not gate.idle:
+                wake_ms.append(1000.0 * (ts - gate.woke_at + time.perf_counter() - t0))
+        cap.release()
+        results.append({"mode": "gated" if gated else "always", "cpu_sec": time.process_time() - cpu0,
+                        "frames": frames, "detections": detections, "wakeups": gate.stats["wakeups"],
+                        "idle_sec": gate.stats["idle_sec"], "wake_ms": sum(wake_ms) / len(wake_ms) if wake_ms else None})
+    return results
+
+class RecognitionPipeline:
+    """Detection, encoding, matching and stranger tracking for any number of sources. Knows nothing about Tk.
+
+    process() may run on worker threads; per-source state is only touched by the single in-flight frame
+    of that source (see RecognitionPool), and the known-faces snapshot is swapped under a lock.
+    """
+    def __init__(self, on_unknown_captured=None):
+        self._lock = threading.Lock()
+        self.gallery = FaceGallery([], [])
+        self.relations = {}
+        self.metadata = {}
+        self.notes = {}
+        self._ref_images = {}  # image path -> decoded reference image (read once, not every frame)
+        self._streams = {}     # source id -> {"tracker": IdentityTracker, "active_unknowns": {track id: capture state}}
+        self.stats = {"faces": 0, "encodes_skipped": 0, "low_quality": 0}
+        self.quality_reasons = collections.Counter()  # why faces were not encoded: small, clipped, blurred, turned
+        self._quality_skips = collections.deque()     # times of encodes the quality gate saved in the last minute
+        self._quality_lock = threading.Lock()          # workers, the Tk thread and the server thread all read the counts
+        self.on_unknown_captured = on_unknown_captured
+        self.on_sighting = None  # callback(source_id, track_id, name, ts) for every recognized face
+        self.detect_scale = 0.25      # detection runs on the frame shrunk by this factor
+        self.display_scale = 1.0      # annotated frames are MA_VIDEO_SIZE times this
+        self.trigger_threshold = TRIGGER_THRESHOLD
+        self.stage_ms = {"detect": 0.0, "encode": 0.0, "annotate": 0.0}  # per-frame latency EMAs
+        self.backend = get_embedding_backend()
+        self.encoder = EncodingBatcher(encode_fn=self.backend.encode)  # shared by every worker, so faces from different streams batch together
+
+    def set_known_faces(self, encodings, names, relations, metadata, notes):
+        gallery = FaceGallery(encodings, names)
+        with self._lock:
+            self.gallery = gallery
+            self.relations = dict(relations)
+            self.metadata = dict(metadata)
+            self.notes = dict(notes)
+            self._ref_images = {}
+
+    def reset_stream(self, source_id):
+        self._streams.pop(source_id, None)
+
+    def _timed_stage(self, stage, t0):
+        t1 = time.perf_counter()
+        self.stage_ms[stage] = 0.9 * self.stage_ms[stage] + 0.1 * 1000.0 * (t1 - t0)
+        return t1
+
+    def has_tracks(self, source_id):
+        """True while any face (known or being captured as unknown) is tracked on this source."""
+        stream = self._streams.get(source_id)
+        return bool(stream and (stream["tracker"].tracks or stream["active_unknowns"]))
+
+    def _reference_image(self, path):
+        img = self._ref_images.get(path)
+        if img is None:
+            try:
+                img = cv2.imread(path)
+            except Exception:
+                img = None
+            if img is not None:
+                with self._lock:
+                    self._ref_images[path] = img
+        return img
+
+    def process(self, source_id, frame):
+        """Recognize faces in one BGR frame. Returns {"frame": annotated display frame, "detected": [...]};
+        each detected face has name, rel, image, notes, track, box (full-res t, r, b, l) and confidence."""
+        scale = self.detect_scale
+        h, w = int(MA_VIDEO_SIZE[1] * self.display_scale), int(MA_VIDEO_SIZE[0] * self.display_scale)
+        frame_resized = cv2.resize(frame, (w, h))
+        t0 = time.perf_counter()
+        small = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        rgb_small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        stream = self._stream(source_id)
+        tracker = stream["tracker"]
+        now = time.time()
+
+        with self._lock:
+            gallery = self.gallery
+            known_relations = self.relations
+            known_metadata = self.metadata
+            known_notes = self.notes
+
+        try:
+            face_locations = face_recognition.face_locations(rgb_small)
+            t0 = self._timed_stage("detect", t0)
+            boxes = [(int(top / scale), int(right / scale), int(bottom / scale), int(left / scale))
+                     for (top, right, bottom, left) in face_locations]
+            track_ids = tracker.assign(boxes, now)
+            # Only tracks whose vote is uncertain (or due for re-verification) go through the encoder.
+            to_encode = [i for i, tid in enumerate(track_ids) if tracker.needs_encoding(tid, now)]
+            self.stats["faces"] += len(track_ids)
+            self.stats["encodes_skipped"] += len(track_ids) - len(to_encode)
+            if QUALITY_GATE > 0 and to_encode:
+                to_encode = self._quality_gate(rgb_small, face_locations, to_encode, now)
+            encodings = self.encoder.encode(rgb_small, [face_locations[i] for i in to_encode])
+            if to_encode:
+                t0 = self._timed_stage("encode", t0)
+        except Exception:
+            return {"frame": frame_resized, "detected": []}
+
+        for i, face_encoding in zip(to_encode, encodings):
+            name = None
+            if len(gallery):
+                best_idx, best_dist = gallery.match(face_encoding)
+                if best_dist < self.backend.threshold:
+                    name = gallery.names[best_idx]
+            tracker.vote(track_ids[i], name, now, face_encoding)
+
+        color_safe, color_warn = (0, 255, 127), (71, 71, 255)
+        current_frame_unidentified = []
+        detected_list = []
+
+        for (t, r, b, l), tid in sorted(zip(boxes, track_ids), key=lambda item: item[1]):
+            name, relation, ref_image = "Unknown", "Stranger", None
+            scale_x, scale_y = w / (frame.shape[1]), h / (frame.shape[0])
+            td, rd, bd, ld = int(t * scale_y), int(r * scale_x), int(b * scale_y), int(l * scale_x)
+
+            identity = tracker.identity(tid)
+            if identity is not None and identity in known_relations:
+                name = identity
+                relation = known_relations.get(name, "Known")
+                if self.on_sighting is not None:
+                    self.on_sighting(source_id, tid, name, now)
+                if name in known_metadata:
+                    ref_image = self._reference_image(known_metadata[name])
+
+            if ref_image is None or ref_image.size == 0:
+                ref_image = frame[max(0, t):min(frame.shape[0], b), max(0, l):min(frame.shape[1], r)]
+
+            notes = known_notes.get(name, "") if name != "Unknown" else ""
+            detected_list.append({"name": name, "rel": relation, "image": ref_image.copy(), "notes": notes, "track": tid,
+                                  "box": [int(t), int(r), int(b), int(l)], "confidence": tracker.confidence(tid)})
+
+            color = color_safe if relation != "Stranger" else color_warn
+            cv2.rectangle(frame_resized, (ld, td), (rd, bd), color, 2)
+            cv2.putText(frame_resized, name, (ld, td - 6), cv2.FONT_HERSHEY_DUPLEX, 0.55, color, 1)
+
+            if relation == "Stranger" and tracker.tracks[tid]["decided"]:  # never captured unless it passed the gate once
+                current_frame_unidentified.append((tid, (t, r, b, l)))
+
+        self._track_unknowns(source_id, frame, current_frame_unidentified)
+        self._timed_stage("annotate", t0)
+        return {"frame": frame_resized, "detected": detected_list[:8]}
+
+    def _quality_gate(self, rgb_small, locations, candidates, now):
+        """The candidates (indexes into locations) whose face is good enough to be worth encoding."""
+        gray = cv2.cvtColor(rgb_small, cv2.COLOR_RGB2GRAY)
+        try:
+            marks = face_recognition.face_landmarks(rgb_small, [locations[i] for i in candidates], model="small")
+        except Exception:
+            marks = []
+        keep = []
+        for n, i in enumerate(candidates):
+            score, weakest = face_quality(gray, locations[i], self.detect_scale, marks[n] if n < len(marks) else None)
+            if score >= QUALITY_GATE:
+                keep.append(i)
+                continue
+            with self._quality_lock:
+                self.stats["low_quality"] += 1
+                self.quality_reasons[weakest] += 1
+                self._quality_skips.append(now)
+        return keep
+
+    def encodes_saved_per_min(self, now=None):
+        """Encoder calls the quality gate skipped in the last minute."""
+        cutoff = (now or time.time()) - 60.0
+        with self._quality_lock:
+            skips = self._quality_skips
+            while skips and skips[0] < cutoff:
+                skips.popleft()
+            return len(skips)
+
+    def quality_report(self):
+        """{"skipped": total, "per_min": last minute, "reasons": {reason: count}} for the quality gate."""
+        per_min = self.encodes_saved_per_min()
+        with self._quality_lock:
+            return {"skipped": self.stats["low_quality"], "per_min": per_min, "reasons": dict(self.quality_reasons)}
+
+    def _stream(self, source_id):
+        stream = self._streams.get(source_id)
+        if stream is None:
+            stream = self._streams[source_id] = {"tracker": IdentityTracker(), "active_unknowns": {}}
+        return stream
+
+    def _track_unknowns(self, source_id, frame, current_frame_unidentified):
+        """Capture the best crops of a stranger who stays in view; keyed by identity track."""
+        stream = self._stream(source_id)
+        active_unknowns = stream["active_unknowns"]
+        new_active_unknowns = {}
+        for tid, (t, r, b, l) in current_frame_unidentified:
+            u_data = active_unknowns.get(tid)
+            if u_data is None:
+                new_active_unknowns[tid] = {"count": 1, "is_saving": False, "buffer": None, "start_time": 0, "last_pos": (t, r, b, l)}
+                continue
+            u_data["last_pos"] = (t, r, b, l)
+            u_data["count"] += 1
+            if u_data["count"] >= self.trigger_threshold and not u_data["is_saving"]:
+                u_data["is_saving"] = True
+                u_data["start_time"] = time.time()
+                u_data["buffer"] = CaptureReservoir()
+            if u_data["is_saving"]:
+                elapsed = time.time() - u_data["start_time"]
+                if elapsed < SAVE_DURATION:
+                    crop = frame[max(0, t):min(frame.shape[0], b), max(0, l):min(frame.shape[1], r)]
+                    u_data["buffer"].offer(crop)
+                else:
+                    if self.on_unknown_captured is not None:
+                        track = stream["tracker"].tracks.get(tid) or {}
+                        self.on_unknown_captured(source_id, u_data["buffer"].best(), track.get("encoding"))
+                    u_data["buffer"] = None
+                    u_data["is_saving"] = False
+                    u_data["count"] = -150  # cool-down before the same track is captured again
+            new_active_unknowns[tid] = u_data
+        stream["active_unknowns"] = new_active_unknowns
+
+class RecognitionPool:
+    """Worker threads shared by all sources, fed from per-source single-frame slots and scheduled round-robin.
+
+    Each source has at most one frame waiting and one in flight, so a busy camera cannot starve the others.
+    Live cameras replace a waiting frame (newest wins, the old one counts as dropped); video files are not
+    read while their slot is full (see can_accept), so files are processed completely at the pool's pace.
+    With workers=0, submit() processes the frame immediately on the calling thread.
+    """
+    def __init__(self, process_fn, workers=MA_WORKERS):
+        self.process_fn = process_fn
+        self.workers = max(0, int(workers))
+        self._cond = threading.Condition()
+        self._order = []     # source ids in round-robin order
+        self._rr = 0
+        self._waiting = {}   # source id -> frame
+        self._busy = set()
+        self._results = {}   # source id -> latest result
+        self.stats = {}      # source id -> {"submitted", "processed", "dropped", "fps"}
+        self.on_result = None  # callback(source_id, result) on the thread that processed the frame
+        self._threads = []
+        self._running = False
+
+    def add_source(self, source_id):
+        with self._cond:
+            if source_id not in self._order:
+                self._order.append(source_id)
+                self.stats[source_id] = {"submitted": 0, "processed": 0, "dropped": 0, "fps": 0.0, "_last": None}
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"recognition-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._waiting.clear()
+            self._results.clear()
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=2)
+        self._threads = []
+
+    def can_accept(self, source_id):
+        with self._cond:
+            return source_id not in self._waiting
+
+    def submit(self, source_id, frame):
+        if self.workers == 0:
+            self._run(source_id, frame)
+            return
+        with self._cond:
+            st = self.stats[source_id]
+            if source_id in self._waiting:
+                st["dropped"] += 1
+            self._waiting[source_id] = frame
+            st["submitted"] += 1
+            self._cond.notify()
+
+    def result(self, source_id):
+        with self._cond:
+            return self._results.get(source_id)
+
+
+    def _next_job(self):
+        n = len(self._order)
+        for i in range(n):
+            sid = self._order[(self._rr + i) % n]
+            if sid in self._waiting and sid not in self._busy:
+                self._rr = (self._rr + i + 1) % n
+                self._busy.add(sid)
+                return sid, self._waiting.pop(sid)
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job() if self._running else None
+                while self._running and job is None:
+                    self._cond.wait(0.5)
+                    job = self._next_job()
+                if not self._running:
+                    return
+            sid, frame = job
+            try:
+                self._run(sid, frame)
+            finally:
+                with self._cond:
+                    self._busy.discard(sid)
+                    self._cond.notify_all()
+
+    def _run(self, source_id, frame):
+        try:
+            result = self.process_fn(source_id, frame)
+        except Exception:
+            return
+        now = time.time()
+        with self._cond:
+            st = self.stats[source_id]
+            st["processed"] += 1
+            if st["_last"] is not None and now > st["_last"]:
+                st["fps"] = 0.8 * st["fps"] + 0.2 / (now - st["_last"])
+            st["_last"] = now
+            self._results[source_id] = result
+        if self.on_result is not None:
+            try:
+                self.on_result(source_id, result)
+            except Exception:
+                pass  # a failing subscriber must not take the worker thread down with it
+
+# ---------------- PERFORMANCE PROFILES ----------------
+# Each knob is (lowest, highest). The auto-tuner starts at the quality end and trades down only as far as it must.
+PERFORMANCE_PROFILES = {
+    "low-power": {"target_fps": 5, "detect_scale": (0.15, 0.25), "display_scale": (0.5, 0.75), "capture_ms": (60, 250),
+                  "ui_poll_ms": 150, "trigger_frames": 4},
+    "balanced":  {"target_fps": 12, "detect_scale": (0.2, 0.3), "display_scale": (0.75, 1.0), "capture_ms": (30, 120),
+                  "ui_poll_ms": 80, "trigger_frames": 8},
+    "accuracy":  {"target_fps": 15, "detect_scale": (0.3, 0.5), "display_scale": (1.0, 1.0), "capture_ms": (30, 80),
+                  "ui_poll_ms": 60, "trigger_frames": 12},
+}
+MA_PROFILE = os.environ.get("MA_PROFILE", "balanced")
+MA_AUTOTUNE = os.environ.get("MA_AUTOTUNE", "1") != "0"
+AUTOTUNE_PERIOD_SEC = 2.0      # measurement window between adjustments
+AUTOTUNE_SCALE_STEP = 0.05
+AUTOTUNE_DISPLAY_STEP = 0.125
+AUTOTUNE_CAPTURE_STEP_MS = 10
+
+def performance_profile(name):
+    if name not in PERFORMANCE_PROFILES:
+        print(f"Unknown performance profile {name!r}; using balanced")
+        name = "balanced"
+    return name, PERFORMANCE_PROFILES[name]
+
+class AutoTuner:
+    """Moves detection scale, display scale and capture interval within a profile's bounds to hold its target fps.
+
+    update() is fed the frame rate measured over one window. Below 90% of target it shortens the capture interval,
+    then lowers the detection scale, then the display size. Above 120% it restores display size, then detection
+    scale if the measured detection time at the larger scale would still fit the frame budget, and otherwise
+    lengthens the capture interval so no more frames are processed than the target needs.
+    """
+    def __init__(self, profile):
+        self.profile = profile
+        self.settings = {"detect_scale": profile["detect_scale"][1], "display_scale": profile["display_scale"][1],
+                         "capture_ms": profile["capture_ms"][0]}
+        self.history = collections.deque(maxlen=50)  # (ts, knob, old, new, measured fps)
+
+    def _step(self, knob, delta):
+        lo, hi = self.profile[knob]
+        value = self.settings[knob] + delta
+        value = round(min(hi, max(lo, value)), 3)
+        return (knob, value) if value != self.settings[knob] else None
+
+    def update(self, fps, stage_ms):
+        """Returns True if a setting changed."""
+        s, target = self.settings, self.profile["target_fps"]
+        change = None
+        if fps < 0.9 * target:
+            change = (self._step("capture_ms", -AUTOTUNE_CAPTURE_STEP_MS) or self._step("detect_scale", -AUTOTUNE_SCALE_STEP)
+                      or self._step("display_scale", -AUTOTUNE_DISPLAY_STEP))
+        elif fps > 1.2 * target:
+            change = self._step("display_scale", AUTOTUNE_DISPLAY_STEP)
+            bigger = self._step("detect_scale", AUTOTUNE_SCALE_STEP)
+            if change is None and bigger is not None:
+                detect = stage_ms.get("detect", 0.0) * (bigger[1] / s["detect_scale"]) ** 2
+                if detect + stage_ms.get("encode", 0.0) + stage_ms.get("annotate", 0.0) < 0.8 * 1000.0 / target:
+                    change = bigger
+            if change is None:
+                change = self._step("capture_ms", AUTOTUNE_CAPTURE_STEP_MS)
+        if change is None:
+            return False
+        knob, value = change
+        self.history.append((time.time(), knob, s[knob], value, round(fps, 1)))
+        s[knob] = value
+        return True
+
+# ---------------- RECOGNITION SERVICE ----------------
+DAEMON_ADDRESS = os.environ.get("MA_DAEMON", "")  # "unix:/path/ma.sock" or "127.0.0.1:8765"; set it to make the window a client of `serve`
+DAEMON_DEFAULT_ADDRESS = "unix:mindmenders.sock" if hasattr(socket, "AF_UNIX") else "127.0.0.1:8765"
+DAEMON_CLIENT_QUEUE = 64  # messages buffered per client; a slow client loses its oldest messages, recognition never waits
+DAEMON_FRAME_FPS = 10     # annotated frames per second per source sent to clients that subscribe with "frames"
+DAEMON_JPEG_QUALITY = 70
+
+def parse_daemon_address(address):
+    """'unix:/tmp/ma.sock' -> ("unix", path); 'host:port' or ':port' -> ("tcp", (host, port)), host defaulting to localhost."""
+    address = address or DAEMON_DEFAULT_ADDRESS
+    if address.startswith("unix:"):
+        return "unix", address[5:]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+def _jpeg_b64(img):
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, DAEMON_JPEG_QUALITY])
+    return base64.b64encode(buf.tobytes()).decode("ascii") if ok else None
+
+def _jpeg_decode(data):
+    try:
+        return cv2.imdecode(np.frombuffer(base64.b64decode(data), np.uint8), cv2.IMREAD_COLOR)
+    except Exception:
+        return None
+
+class RecognitionService:
+    """One set of cameras, one gallery and one recognition pipeline, shared by any number of subscribers.
+
+    A subscriber is a callable taking (event, payload): event is the JSON-safe message sent to socket clients,
+    payload holds the images that go with it ({"frame", "images"} for detections, {"crop"} for a captured
+    stranger). Recognized faces are written to the sighting log and captured strangers to the sighting store
+    here, once, rather than by every client. tick() does one capture pass and returns the delay in ms before
+    the next one, so it can be driven by Tk's after() or by a plain loop.
+    """
+    def __init__(self, sources, db, sighting_log=None, sightings=None, workers=MA_WORKERS, profile=MA_PROFILE, autotune=MA_AUTOTUNE):
+        self.sources = list(sources)
+        self.db = db
+        self.sighting_log = sighting_log
+        self.sightings = sightings
+        self.caps = {}   # source id (index into self.sources) -> cv2.VideoCapture
+        self.gates = {}  # camera source id -> MotionGate
+        self.pipeline = RecognitionPipeline(on_unknown_captured=self._unknown_captured)
+        self.pipeline.on_sighting = self._record_sighting
+        self.pool = RecognitionPool(self.pipeline.process, workers)
+        self.pool.on_result = self._publish_result
+        for sid in range(len(self.sources)):
+            self.pool.add_source(sid)
+        self.profile_name, self.profile = performance_profile(profile)
+        self.tuner = AutoTuner(self.profile)
+        self.autotune = autotune
+        self._tune_window = None  # {"start", "processed": {source id: count}, "excluded": sources idle during the window}
+        self._apply_settings()
+        self._person_ids = {}  # name -> person id
+        self._subscribers = []
+        self._sub_lock = threading.Lock()
+
+    def subscribe(self, fn):
+        with self._sub_lock:
+            self._subscribers.append(fn)
+
+    def unsubscribe(self, fn):
+        with self._sub_lock:
+            if fn in self._subscribers:
+                self._subscribers.remove(fn)
+
+    def _publish(self, event, payload=None):
+        with self._sub_lock:
+            subscribers = list(self._subscribers)
+        for fn in subscribers:
+            try:
+                fn(event, payload or {})
+            except Exception:
+                pass
+
+    def source_labels(self):
+        return [source_label(s) for s in self.sources]
+
+    def _apply_settings(self):
+        s = self.tuner.settings
+        self.pipeline.detect_scale = s["detect_scale"]
+        self.pipeline.display_scale = s["display_scale"]
+        self.pipeline.trigger_threshold = self.profile["trigger_frames"]
+
+    def _autotune(self, now):
+        """Measure each active source's processed fps over AUTOTUNE_PERIOD_SEC and let the tuner react to the slowest.
+        Sources that were idle at any point in the window are left out, so wake-ups don't read as slowness."""
+        w = self._tune_window
+        if w is None:
+            self._tune_window = {"start": now, "processed": {sid: st["processed"] for sid, st in self.pool.stats.items()},
+                                 "excluded": set()}
+            return
+        w["excluded"].update(sid for sid, gate in self.gates.items() if gate.idle)
+        if now - w["start"] < AUTOTUNE_PERIOD_SEC:
+            return
+        rates = [(self.pool.stats[sid]["processed"] - w["processed"].get(sid, 0)) / (now - w["start"])
+                 for sid in self.caps if sid not in w["excluded"]]
+        self._tune_window = None
+        if rates and self.tuner.update(min(rates), self.pipeline.stage_ms):
+            self._apply_settings()
+
+    def reload(self, db=None):
+        """Rebuild the gallery from db (default: the current one) and tell subscribers how many people it holds."""
+        if db is not None:
+            self.db = db
+        enc, names, rels, meta = load_known_faces_from_app_db(self.db, self.pipeline.encoder, self.pipeline.backend)
+        notes, ids = {}, {}
+        for p in self.db.get("people", []):
+            n = (p.get("name") or "").strip()
+            if n and n not in notes:
+                notes[n] = (p.get("notes") or "").strip()
+                ids[n] = p.get("id")
+        self._person_ids = ids
+        self.pipeline.set_known_faces(enc, names, rels, meta, notes)
+        self._publish({"type": "gallery", "people": len(ids), "encodings": len(enc)})
+
+    def start(self):
+        """Open every source that is not open yet and start the recognition pool. False if nothing could be opened."""
+        for sid, source in enumerate(self.sources):
+            cap = self.caps.get(sid)
+            if cap is not None and cap.isOpened():
+                continue
+            cap = open_capture(source)
+            if cap is not None:
+                self.caps[sid] = cap
+                self.pipeline.reset_stream(sid)
+                if not is_file_source(source):
+                    self.gates[sid] = MotionGate()
+        if not self.caps:
+            return False
+        self.pipeline.encoder.expected_producers = min(self.pool.workers, len(self.caps))
+        self.pool.start()
+        return True
+
+    def stop(self):
+        self.pool.stop()
+        for cap in self.caps.values():
+            if cap.isOpened():
+                cap.release()
+        self.caps = {}
+        self.gates = {}
+
+    def tick(self):
+        """Read one frame from every open source and hand it to the pool. Returns ms until the next tick, or None
+        once every source has ended."""
+        if not self.caps:
+            return None
+        for sid, cap in list(self.caps.items()):
+            is_file = is_file_source(self.sources[sid])
+            if is_file and not self.pool.can_accept(sid):
+                continue  # backpressure: leave the file where it is until the pool catches up
+            try:
+                ret, frame = cap.read()
+            except Exception:
+                ret, frame = False, None
+            if not ret:
+                if is_file:
+                    cap.release()
+                    del self.caps[sid]
+                continue
+            if not is_file:
+                frame = cv2.flip(frame, 1)
+                gate = self.gates.get(sid)
+                if gate is not None:
+                    st = self.pool.stats[sid]
+                    gate.result_arrived(st["processed"], st["_last"])
+                    if not gate.should_detect(frame, self.pipeline.has_tracks(sid), processed=st["processed"]):
+                        self._publish_result(sid, {"frame": frame, "detected": []})  # keep displays live while idle
+                        continue
+            self.pool.submit(sid, frame)
+        if self.autotune:
+            self._autotune(time.time())
+        # Cameras are only polled slowly once all of them are idle; files are never throttled.
+        all_idle = all(self.gates.get(sid) is not None and self.gates[sid].idle for sid in self.caps)
+        return IDLE_CAPTURE_MS if all_idle else int(self.tuner.settings["capture_ms"])
+
+    def _publish_result(self, source_id, result):
+        st = self.pool.stats.get(source_id, {})
+        gate = self.gates.get(source_id)
+        faces = [{"track": d["track"], "person_id": self._person_ids.get(d["name"]), "name": d["name"],
+                  "relation": d["rel"], "box": d["box"], "confidence": round(d["confidence"], 3)}
+                 for d in result.get("detected", [])]
+        event = {"type": "detections", "source_id": source_id, "source": source_label(self.sources[source_id]),
+                 "ts": time.time(), "faces": faces, "fps": round(st.get("fps", 0.0), 2), "dropped": st.get("dropped", 0),
+                 "idle": bool(gate and gate.idle), "wake_ms": gate.stats["wake_ms"] if gate else None,
+                 "profile": self.profile_name, "detect_scale": self.pipeline.detect_scale,
+                 "stage_ms": {k: round(v, 1) for k, v in self.pipeline.stage_ms.items()},
+                 "encodes_saved_per_min": self.pipeline.encodes_saved_per_min()}
+        self._publish(event, {"frame": result.get("frame"), "images": {d["track"]: d.get("image") for d in result.get("detected", [])}})
+
+    def _record_sighting(self, source_id, track_id, name, ts):
+        """Log a recognized face (called from recognition workers; the log buffers and writes in the background)."""
+        person_id = self._person_ids.get(name)
+        if person_id and self.sighting_log is not None:
+            self.sighting_log.record(source_label(self.sources[source_id]), track_id, person_id, name, ts)
+
+    def _unknown_captured(self, source_id, crop, encoding=None):
+        """Store a stranger's best crop for visitor clustering and announce it to subscribers."""
+        if encoding is not None and self.sightings is not None:
+            try:
+                self.sightings.add(encoding, crop, source_label(self.sources[source_id]), self.pipeline.backend.name)
+            except Exception:
+                pass
+        self._publish({"type": "unknown", "source_id": source_id, "source": source_label(self.sources[source_id]),
+                       "ts": time.time()}, {"crop": crop})
+
+class RecognitionServer:
+    """Serves a RecognitionService on a Unix socket or localhost TCP port, one JSON object per line each way.
+
+    Client commands: {"cmd": "subscribe", "frames": bool, "sources": [ids] or null}, {"cmd": "status"},
+    {"cmd": "reload", "user_id": optional, "email", "password"} (re-read the served user's shard, or switch to
+    another account's, which needs its email and password), {"cmd": "enroll", "name", "relation", "notes", "image": path}
+    and {"cmd": "remove", "person_id"}. The server sends "hello" on connect, then "detections", "frame"
+    (base64 JPEG, rate-limited to DAEMON_FRAME_FPS), "unknown" (with a JPEG crop) and "gallery" events to
+    subscribers, and an "ok" or "error" reply to every command.
+    """
+    def __init__(self, service, address=None, user_id=None):
+        self.service = service
+        self.address = address or DAEMON_ADDRESS or DAEMON_DEFAULT_ADDRESS
+        self.user_id = user_id  # whose shard is served; "reload" switches it given that account's credentials
+        self._server = None
+        self._db_lock = threading.Lock()
+
+    def start(self):
+        family, addr = parse_daemon_address(self.address)
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server._serve_client(self.rfile, self.wfile)
+
+        if family == "unix":
+            if os.path.exists(addr) and stat.S_ISSOCK(os.stat(addr).st_mode):
+                os.remove(addr)  # left behind by a previous run that did not shut down cleanly
+            self._server = socketserver.ThreadingUnixStreamServer(addr, Handler)
+        else:
+            socketserver.ThreadingTCPServer.allow_reuse_address = True
+            self._server = socketserver.ThreadingTCPServer(addr, Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="recognition-server", daemon=True).start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            family, addr = parse_daemon_address(self.address)
+            if family == "unix" and os.path.exists(addr):
+                os.remove(addr)
+            self._server = None
+
+    def _serve_client(self, rfile, wfile):
+        out = queue.Queue(DAEMON_CLIENT_QUEUE)
+        opts = {"subscribed": False, "frames": False, "sources": None, "frame_at": {}}
+
+        def send(msg):
+            while True:
+                try:
+                    out.put_nowait(msg)
+                    return
+                except queue.Full:
+                    try:
+                        out.get_nowait()  # drop the oldest; the client is not keeping up
+                    except queue.Empty:
+                        pass
+
+        def deliver(event, payload):
+            sid = event.get("source_id")
+            if not opts["subscribed"] or (opts["sources"] is not None and sid is not None and sid not in opts["sources"]):
+                return
+            if event["type"] == "unknown":
+                crop = payload.get("crop")
+                send(dict(event, jpeg=_jpeg_b64(crop) if crop is not None and crop.size else None))
+                return
+            send(event)
+            frame = payload.get("frame")
+            if event["type"] == "detections" and opts["frames"] and frame is not None:
+                now = time.time()
+                if now - opts["frame_at"].get(sid, 0) >= 1.0 / DAEMON_FRAME_FPS:
+                    opts["frame_at"][sid] = now
+                    if "_jpeg" not in payload:
+                        payload["_jpeg"] = _jpeg_b64(frame)  # encoded once per frame, shared by every client
+                    send({"type": "frame", "source_id": sid, "ts": event["ts"], "jpeg": payload["_jpeg"]})
+
+        def writer():
+            while True:
+                msg = out.get()
+                if msg is None:
+                    return
+                try:
+                    wfile.write((json.dumps(msg) + "\n").encode("utf-8"))
+                    wfile.flush()
+                except (OSError, ValueError):
+                    return
+
+        t = threading.Thread(target=writer, name="recognition-client", daemon=True)
+        t.start()
+        send({"type": "hello", "sources": self.service.source_labels(), "backend": self.service.pipeline.backend.name})
+        self.service.subscribe(deliver)
+        try:
+            for line in rfile:
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    send({"type": "error", "error": "invalid JSON"})
+                    continue
+                send(self._command(msg, opts))
+        except OSError:
+            pass
+        finally:
+            self.service.unsubscribe(deliver)
+            out.put(None)
+
+    def _command(self, msg, opts):
+        cmd = msg.get("cmd")
+        try:
+            if cmd == "subscribe":
+                opts["subscribed"] = True
+                opts["frames"] = bool(msg.get("frames"))
+                opts["sources"] = set(msg["sources"]) if msg.get("sources") is not None else None
+                return {"type": "ok", "cmd": cmd}
+            if cmd == "status":
+                stats = {sid: {k: v for k, v in st.items() if not k.startswith("_")} for sid, st in self.service.pool.stats.items()}
+                return {"type": "ok", "cmd": cmd, "sources": self.service.source_labels(), "stats": stats,
+                        "people": len(self.service.db.get("people", [])), "quality": self.service.pipeline.quality_report()}
+            if cmd == "reload":
+                uid = msg.get("user_id")
+                if uid and uid != self.user_id:
+                    user = find_user(msg.get("email"))
+                    if user is None or user["id"] != uid or not check_password(user, msg.get("password")):
+                        return {"type": "error", "cmd": cmd, "error": "switching accounts needs that account's email and password"}
+                with self._db_lock:
+                    if uid:
+                        self.user_id = uid
+                        self.service.sightings = unknown_sighting_store(uid)
+                    self.service.reload(load_db(self.user_id))
+                return {"type": "ok", "cmd": cmd}
+            if cmd == "enroll":
+                name = (msg.get("name") or "").strip()
+                if not name or not msg.get("image"):
+                    return {"type": "error", "cmd": cmd, "error": "name and image are required"}
+                person = {"name": name, "relation": (msg.get("relation") or "").strip(),
+                          "notes": (msg.get("notes") or "").strip(), "image": ingest_image(msg["image"])}
+                with self._db_lock:
+                    db = load_db(self.user_id)  # the file is the source of truth; the window may have changed it since
+                    db.setdefault("people", []).append(person)
+                    save_db(db)
+                    self.service.reload(db)
+                return {"type": "ok", "cmd": cmd, "person_id": person["id"]}
+            if cmd == "remove":
+                with self._db_lock:
+                    db = load_db(self.user_id)
+                    people = db.get("people", [])
+                    db["people"] = [p for p in people if p.get("id") != msg.get("person_id")]
+                    if len(db["people"]) == len(people):
+                        return {"type": "error", "cmd": cmd, "error": "no such person"}
+                    save_db(db)
+                    self.service.reload(db)
+                return {"type": "ok", "cmd": cmd}
+            return {"type": "error", "cmd": cmd, "error": "unknown command"}
+        except Exception as e:
+            return {"type": "error", "cmd": cmd, "error": f"{e.__class__.__name__}: {e}"}
+
+class RecognitionClient:
+    """Subscriber end of the RecognitionServer protocol. A reader thread turns each line into on_event(event, payload),
+    decoding "frame" and "unknown" JPEGs into payload["frame"] / payload["crop"] like the in-process service does."""
+    def __init__(self, address, on_event):
+        self.address = address
+        self.on_event = on_event
+        self.sources = []
+        self._sock = None
+        self._send_lock = threading.Lock()
+
+    def connect(self, frames=False, sources=None, timeout=2.0):
+        family, addr = parse_daemon_address(self.address)
+        sock = socket.socket(socket.AF_UNIX if family == "unix" else socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(addr)
+        sock.settimeout(None)
+        self._sock = sock
+        threading.Thread(target=self._reader, args=(sock,), name="recognition-subscriber", daemon=True).start()
+        self.send({"cmd": "subscribe", "frames": frames, "sources": sources})
+
+    def send(self, msg):
+        if self._sock is None:
+            return False
+        try:
+            with self._send_lock:
+                self._sock.sendall((json.dumps(msg) + "\n").encode("utf-8"))
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _reader(self, sock):
+        try:
+            for line in sock.makefile("rb"):
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                payload = {}
+                if event.get("type") == "hello":
+                    self.sources = event.get("sources", [])
+                elif event.get("type") == "frame":
+                    payload["frame"] = _jpeg_decode(event.pop("jpeg", ""))
+                elif event.get("type") == "unknown" and event.get("jpeg"):
+                    payload["crop"] = _jpeg_decode(event.pop("jpeg"))
+                self.on_event(event, payload)
+        except (OSError, ValueError):
+            pass
+        if self._sock is sock:
+            self.on_event({"type": "disconnected"}, {})
 
 class MemoryAssistant(ctk.CTkFrame):
     def __init__(self, app):
         super().__init__(app, fg_color="black")
         self.app = app
-        self.cap = None
+        self.sources = parse_sources(MA_SOURCES)
+        self.selected_source = 0
         self.running = False
-        self.current_frame = None
-        self.detected_list = []
-        self.known_encodings = []
-        self.known_names = []
-        self.known_relations = {}
-        self.known_metadata = {}
-        self.active_unknowns = {}
-        self.next_id = 0
         self.pending_unknowns = []  # captured unknowns kept until registered or 5 min timeout
         self._pending_id_counter = 0
         self._last_sidebar_state = None
         self._pending_ids_shown = ()  # when non-empty, sidebar is frozen so user can type
         self._lock = threading.Lock()
+        self._latest = {}  # source id -> {"event": last detections event, "frame", "images": {track: image}}
+        self._people_by_id = {}
+        self._ref_images = {}  # image path -> decoded reference image, for faces reported by the daemon
+        self._disconnected = False
+        self._cpu_mark = None  # (wall, process cpu) at the last CPU usage sample
+        self._cpu_pct = 0.0
+        self._shown_frame = None
+        self.ui_poll_ms = performance_profile(MA_PROFILE)[1]["ui_poll_ms"]
+        self._video_image = None  # one CTkImage reused for every frame instead of a new one per frame
+        self._thumbs = collections.OrderedDict()  # (name, image path) -> CTkImage, for known people's sidebar cards
+        # With MA_DAEMON set this window is just another subscriber of `main.py serve`; otherwise it runs the
+        # recognition service in-process and subscribes to it directly.
+        self.client = None
+        self.service = None
+        if not DAEMON_ADDRESS:
+            self.service = RecognitionService(self.sources, app.db, app.sighting_log, app.sightings)
+            self.service.subscribe(self._on_event)
 
         btn(self, "← Back", self._go_back, 140).pack(anchor="nw", padx=20, pady=20)
 
         content = ctk.CTkFrame(self, fg_color="black")
         content.pack(fill="both", expand=True, padx=20, pady=(0, 20))
 
-        self.video_label = ctk.CTkLabel(content, text="Starting camera…", width=MA_VIDEO_SIZE[0], height=MA_VIDEO_SIZE[1], fg_color="#111", corner_radius=8)
-        self.video_label.pack(side="left", padx=(0, 20), pady=10)
+        video_col = ctk.CTkFrame(content, fg_color="black")
+        video_col.pack(side="left", padx=(0, 20), pady=10)
+        if len(self.sources) > 1:
+            self.stream_selector = ctk.CTkSegmentedButton(
+                video_col, values=[source_label(s) for s in self.sources], command=self._select_stream)
+            self.stream_selector.set(source_label(self.sources[0]))
+            self.stream_selector.pack(anchor="w", pady=(0, 8))
+        self.video_label = ctk.CTkLabel(video_col, text="Starting camera…", width=MA_VIDEO_SIZE[0], height=MA_VIDEO_SIZE[1], fg_color="#111", corner_radius=8)
+        self.video_label.pack()
+        self.status_label = ctk.CTkLabel(video_col, text="", font=ctk.CTkFont(size=11), text_color="#666")
+        self.status_label.pack(anchor="w", pady=(4, 0))
 
         sidebar = ctk.CTkFrame(content, width=320, fg_color="#0d0d0d", corner_radius=12)
         sidebar.pack(side="right", fill="y", padx=0, pady=10)
@@ -744,234 +2994,256 @@ class MemoryAssistant(ctk.CTkFrame):
         ctk.CTkLabel(sidebar, text="LIVE RECOGNITION", font=ctk.CTkFont(size=16, weight="bold"), text_color="#ffa500").pack(pady=16, padx=16, anchor="w")
         ctk.CTkLabel(sidebar, text="Detected people", font=ctk.CTkFont(size=12), text_color="#888").pack(pady=(0, 12), padx=16, anchor="w")
 
+        self.voice = VoiceAssistant()
+        ask = ctk.CTkFrame(sidebar, fg_color="#1a1a1a", corner_radius=10)
+        ask.pack(side="bottom", fill="x", padx=12, pady=(0, 12))
+        ask_row = ctk.CTkFrame(ask, fg_color="transparent")
+        ask_row.pack(fill="x", padx=8, pady=(8, 4))
+        self.ask_entry = ctk.CTkEntry(ask_row, height=28, font=ctk.CTkFont(size=12), placeholder_text="Ask: who is this?")
+        self.ask_entry.pack(side="left", fill="x", expand=True)
+        self.ask_entry.bind("<Return>", lambda e: self._ask_typed())
+        ctk.CTkButton(ask_row, text="Ask", width=44, height=28, corner_radius=14, fg_color="white", text_color="black",
+                      command=self._ask_typed).pack(side="left", padx=(6, 0))
+        self.mic_btn = ctk.CTkButton(ask_row, text="Mic", width=44, height=28, corner_radius=14, fg_color="#444", text_color="white",
+                                     command=self._toggle_mic)
+        self.mic_btn.pack(side="left", padx=(6, 0))
+        self.answer_label = ctk.CTkLabel(ask, text="", font=ctk.CTkFont(size=12), text_color="#ddd", wraplength=270, justify="left")
+        self.answer_label.pack(anchor="w", padx=8, pady=(0, 8))
+
         self.sidebar_scroll = ctk.CTkScrollableFrame(sidebar, fg_color="transparent")
         self.sidebar_scroll.pack(fill="both", expand=True, padx=12, pady=(0, 12))
 
+    def _ask_typed(self):
+        q = self.ask_entry.get().strip()
+        if q:
+            self.ask_entry.delete(0, "end")
+            self.voice.ask(q)
+
+    def _toggle_mic(self):
+        self.voice.toggle_listening()
+        self.after(300, lambda: self.mic_btn.configure(fg_color="#c0392b" if self.voice.listening else "#444"))
+
+    def _poll_voice(self):
+        """Drain streamed assistant events into the answer label; never blocks."""
+        if not self.winfo_exists() or not self.running:
+            return
+        text = self.answer_label.cget("text")
+        changed = False
+        while True:
+            try:
+                kind, value = self.voice.events.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            if kind == "heard":
+                text = f"“{value}”\n"
+            elif kind == "start":
+                text = text if text.startswith("“") else ""
+            elif kind == "token":
+                text += value
+            elif kind == "error":
+                text = value
+        if changed:
+            self.answer_label.configure(text=text)
+        self.after(50, self._poll_voice)
+
     def on_show(self):
-        if not HAS_NUMPY or not HAS_FACE_RECOGNITION:
+        if not HAS_NUMPY or (self.service is not None and not HAS_FACE_RECOGNITION):
             messagebox.showinfo(
                 "Memory Assistant",
                 "Install required packages:\npip install numpy face_recognition"
             )
             return
-        self._reload_known_faces()
         self.running = True
         self._pending_ids_shown = ()
-        self._start_camera_then_run()
+        self._disconnected = False
+        if self.service is None:
+            self.client = RecognitionClient(DAEMON_ADDRESS, self._on_event)
+            try:
+                self.client.connect(frames=True)
+            except OSError as e:
+                self.client = None
+                self.running = False
+                messagebox.showerror("Memory Assistant", f"Recognition service at {DAEMON_ADDRESS} is not reachable:\n{e}")
+                return
+            self._reload_known_faces()
+        else:
+            self._reload_known_faces()
+            if self.service.start():
+                self.after(0, self._capture_tick)
+            else:
+                messagebox.showerror("Memory Assistant", "Could not open camera.")
         self._poll_ui()
+        self._poll_voice()
 
     def on_hide(self):
         self.running = False
-        if self.cap and self.cap.isOpened():
-            self.cap.release()
-            self.cap = None
+        if self.voice.listening:
+            self.voice.toggle_listening()
+        if self.service is not None:
+            self.service.stop()
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+        with self._lock:
+            self._latest = {}
 
     def _go_back(self):
         self.on_hide()
         self.app.show(Home)
 
-    def _reload_known_faces(self):
-        enc, names, rels, meta = load_known_faces_from_app_db(self.app.db)
+    def _select_stream(self, label):
+        labels = [source_label(s) for s in self.sources]
+        if label in labels:
+            self.selected_source = labels.index(label)
+            self._last_sidebar_state = None
+
+    def _reload_known_faces(self, password=None):
+        self._people_by_id = {p.get("id"): p for p in self.app.db.get("people", []) if p.get("id")}
+        if self.service is not None:
+            self.service.sightings = self.app.sightings
+            self.service.reload(self.app.db)
+        elif self.client is not None:
+            # The daemon re-reads the signed-in user's shard, which this window has just saved. It only switches
+            # to a different account than the one it serves when given that account's credentials.
+            msg = {"cmd": "reload", "user_id": self.app.db.get("owner")}
+            if password is not None and self.app.user:
+                msg.update(email=self.app.user.get("email"), password=password)
+            self.client.send(msg)
+
+    def switch_user(self, password=None):
+        """Forget everything belonging to the previous user and load the current user's gallery."""
         with self._lock:
-            self.known_encodings = enc
-            self.known_names = names
-            self.known_relations = rels
-            self.known_metadata = meta
-
-    def _add_pending_unknown(self, crop):
-        """Add captured unknown to sidebar (kept until registered via keyboard). Only one at a time."""
-        if self.pending_unknowns:
-            return
-        pending_id = self._pending_id_counter
-        self._pending_id_counter += 1
-        self.pending_unknowns.append({
-            "id": pending_id,
-            "image": crop,
-            "created_at": time.time(),
-        })
-
-    def _start_camera_then_run(self):
-        """Open camera on main thread, then run one recognition frame (avoids cross-thread buffer crashes)."""
-        if self.cap is not None and self.cap.isOpened():
-            self.after(30, self._run_one_frame)
-            return
-        backends = []
-        if platform.system() == "Darwin":
-            backends = [(0, getattr(cv2, "CAP_AVFOUNDATION", cv2.CAP_ANY)), (0, cv2.CAP_ANY)]
-        elif platform.system() == "Windows":
-            backends = [(0, getattr(cv2, "CAP_DSHOW", cv2.CAP_ANY)), (0, cv2.CAP_ANY)]
-        else:
-            backends = [(0, cv2.CAP_ANY), (0, getattr(cv2, "CAP_V4L2", cv2.CAP_ANY))]
-        self.cap = None
-        for idx, backend in backends:
-            cap = cv2.VideoCapture(idx, backend)
-            if cap.isOpened():
-                self.cap = cap
-                break
-            cap.release()
-        if self.cap is None:
-            self.cap = cv2.VideoCapture(0)
-        if not self.cap or not self.cap.isOpened():
-            messagebox.showerror("Memory Assistant", "Could not open camera.")
-            return
-        for _ in range(5):
-            self.cap.read()
-        self.after(0, self._run_one_frame)
-
-    def _run_one_frame(self):
-        """Run one recognition iteration on the main thread (no cross-thread numpy/OpenCV). Safe on Mac."""
-        if not self.winfo_exists() or not self.running or not self.cap or not self.cap.isOpened():
+            self.pending_unknowns = []
+            self._latest = {}
+        self._thumbs.clear()
+        self._ref_images = {}
+        self._last_sidebar_state = None
+        self.voice.reset()
+        self._reload_known_faces(password)
+
+    def _on_event(self, event, payload):
+        """Subscriber callback: recognition workers (in-process) or the daemon reader thread deliver events here."""
+        kind = event.get("type")
+        sid = event.get("source_id")
+        if kind == "unknown":
+            self._add_pending_unknown(sid, payload.get("crop"))
             return
-        try:
-            ret, frame = self.cap.read()
-            if not ret:
-                self.after(30, self._run_one_frame)
-                return
-            frame = cv2.flip(frame, 1).copy()
-            h, w = int(MA_VIDEO_SIZE[1]), int(MA_VIDEO_SIZE[0])
-            frame_resized = cv2.resize(frame, (w, h))
-            small = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
-
-            try:
-                face_locations = face_recognition.face_locations(rgb_small)
-                face_encodings = face_recognition.face_encodings(rgb_small, face_locations)
-            except Exception:
-                with self._lock:
-                    self.current_frame = frame_resized.copy()
-                    self.detected_list = []
-                self.after(30, self._run_one_frame)
+        with self._lock:
+            if kind == "detections":
+                latest = self._latest.setdefault(sid, {})
+                latest["event"] = event
+                latest["images"] = payload.get("images") or {}
+                if payload.get("frame") is not None:
+                    latest["frame"] = payload["frame"]
+            elif kind == "frame" and payload.get("frame") is not None:
+                self._latest.setdefault(sid, {})["frame"] = payload["frame"]
+            elif kind == "disconnected":
+                self._disconnected = True
+
+    def _reference_image(self, path):
+        if path not in self._ref_images:
+            self._ref_images[path] = cv2.imread(path) if os.path.exists(path) else None
+        return self._ref_images[path]
+
+    def _thumb(self, img, key=None):
+        """50x50 CTkImage for a sidebar card. Known people's thumbnails are cached by (id, photo path), so rebuilding
+        the sidebar does not create new images for faces it has already shown."""
+        if key is not None and key in self._thumbs:
+            self._thumbs.move_to_end(key)
+            return self._thumbs[key]
+        thumb = ctk.CTkImage(light_image=Image.fromarray(cv2.cvtColor(cv2.resize(img, (50, 50)), cv2.COLOR_BGR2RGB)), size=(50, 50))
+        if key is not None:
+            self._thumbs[key] = thumb
+            if len(self._thumbs) > MA_THUMB_CACHE:
+                self._thumbs.popitem(last=False)
+        return thumb
+
+    def _add_pending_unknown(self, source_id, crop):
+        """Add a captured unknown to the sidebar (kept until registered via keyboard). Only one pending at a time."""
+        with self._lock:
+            if self.pending_unknowns:
                 return
-
-            color_safe, color_warn = (0, 255, 127), (71, 71, 255)
-            current_frame_unidentified = []
-            detected_list = []
-
-            with self._lock:
-                known_enc = list(self.known_encodings)
-                known_names = list(self.known_names)
-                known_relations = dict(self.known_relations)
-                known_metadata = dict(self.known_metadata)
-
-            for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                name, relation, ref_image = "Unknown", "Stranger", None
-                t, r, b, l = top * 4, right * 4, bottom * 4, left * 4
-                scale_x, scale_y = w / (frame.shape[1]), h / (frame.shape[0])
-                td, rd, bd, ld = int(t * scale_y), int(r * scale_x), int(b * scale_y), int(l * scale_x)
-
-                if known_enc:
-                    face_distances = face_recognition.face_distance(known_enc, face_encoding)
-                    best_idx = np.argmin(face_distances)
-                    if face_distances[best_idx] < RECOGNITION_TOLERANCE:
-                        name = known_names[best_idx]
-                        relation = known_relations.get(name, "Known")
-                        if name in known_metadata:
-                            try:
-                                ref_image = cv2.imread(known_metadata[name])
-                                if ref_image is not None:
-                                    ref_image = ref_image.copy()
-                            except Exception:
-                                pass
-
-                if ref_image is None or ref_image.size == 0:
-                    ref_image = frame[max(0, t):min(frame.shape[0], b), max(0, l):min(frame.shape[1], r)].copy()
-
-                notes = ""
-                if name != "Unknown":
-                    for p in self.app.db.get("people", []):
-                        if (p.get("name") or "").strip() == name:
-                            notes = (p.get("notes") or "").strip()
-                            break
-                detected_list.append({"name": name, "rel": relation, "image": ref_image.copy(), "notes": notes})
-
-                color = color_safe if relation != "Stranger" else color_warn
-                cv2.rectangle(frame_resized, (ld, td), (rd, bd), color, 2)
-                cv2.putText(frame_resized, name, (ld, td - 6), cv2.FONT_HERSHEY_DUPLEX, 0.55, color, 1)
-
-                if relation == "Stranger":
-                    current_frame_unidentified.append((t, r, b, l))
-
-            new_active_unknowns = {}
-            for (t, r, b, l) in current_frame_unidentified:
-                center = ((t + b) / 2, (l + r) / 2)
-                matched_id = None
-                for tid, data in self.active_unknowns.items():
-                    pt, pr, pb, pl = data["last_pos"]
-                    prev_center = ((pt + pb) / 2, (pl + pr) / 2)
-                    if math.sqrt((center[0] - prev_center[0]) ** 2 + (center[1] - prev_center[1]) ** 2) < 100:
-                        matched_id = tid
-                        break
-
-                if matched_id is not None:
-                    u_data = self.active_unknowns[matched_id]
-                    u_data["last_pos"] = (t, r, b, l)
-                    u_data["count"] += 1
-                    if u_data["count"] >= TRIGGER_THRESHOLD and not u_data["is_saving"]:
-                        u_data["is_saving"] = True
-                        u_data["start_time"] = time.time()
-                        u_data["buffer"] = []
-                    if u_data["is_saving"]:
-                        elapsed = time.time() - u_data["start_time"]
-                        if elapsed < SAVE_DURATION:
-                            crop = frame[max(0, t):min(frame.shape[0], b), max(0, l):min(frame.shape[1], r)]
-                            if crop.size > 0:
-                                u_data["buffer"].append(crop.copy())
-                            new_active_unknowns[matched_id] = u_data
-                        else:
-                            crop = (u_data["buffer"][len(u_data["buffer"]) // 2].copy()
-                                    if u_data["buffer"] else None)
-                            self._add_pending_unknown(crop)
-                            u_data["is_saving"] = False
-                            u_data["count"] = -150
-                    else:
-                        new_active_unknowns[matched_id] = u_data
-                else:
-                    new_active_unknowns[self.next_id] = {"count": 1, "is_saving": False, "buffer": [], "start_time": 0, "last_pos": (t, r, b, l)}
-                    self.next_id += 1
-
-            self.active_unknowns = new_active_unknowns
-            with self._lock:
-                self.current_frame = frame_resized.copy()
-                self.detected_list = detected_list[:8]
-        except Exception:
-            pass
-        self.after(30, self._run_one_frame)
+            pending_id = self._pending_id_counter
+            self._pending_id_counter += 1
+            self.pending_unknowns.append({
+                "id": pending_id,
+                "image": crop,
+                "source": source_id,
+                "created_at": time.time(),
+            })
+
+    def _capture_tick(self):
+        """Drive the in-process recognition service's capture loop from the Tk thread."""
+        if not self.winfo_exists() or not self.running:
+            return
+        delay = self.service.tick()
+        if delay is not None:
+            self.after(delay, self._capture_tick)
 
     def _poll_ui(self):
         if not self.winfo_exists() or not self.running:
             return
+        # Events and frames are replaced wholesale by the subscriber callback, never mutated, so no copies are needed.
         with self._lock:
-            cf = self.current_frame
-            frame = cf.copy() if (cf is not None and hasattr(cf, "size") and cf.size > 0) else cf
-            detected_list = []
-            for p in self.detected_list:
-                img = p.get("image")
-                if img is not None and isinstance(img, np.ndarray) and img.size > 0:
-                    detected_list.append({"name": p.get("name", "?"), "rel": p.get("rel", "?"), "image": img.copy(), "notes": p.get("notes", "")})
-                else:
-                    detected_list.append({"name": p.get("name", "?"), "rel": p.get("rel", "?"), "image": img, "notes": p.get("notes", "")})
+            latest = dict(self._latest.get(self.selected_source) or {})
+        event = latest.get("event") or {}
+        frame = latest.get("frame")
+        images = latest.get("images") or {}
+        detected_list = []
+        for face in event.get("faces", []):
+            person = self._people_by_id.get(face.get("person_id")) or {}
+            image = images.get(face.get("track"))
+            if image is None and person.get("image"):
+                image = self._reference_image(person["image"])
+            detected_list.append({"name": face.get("name", "?"), "rel": face.get("relation", "?"), "image": image,
+                                  "notes": (person.get("notes") or "").strip(),
+                                  "key": (person.get("id"), person.get("image")) if person else None})
+        self.voice.set_person(next((p for p in detected_list if p.get("rel") != "Stranger"), None))
+        now = time.time()
+        cpu = time.process_time()
+        if self._cpu_mark is None:
+            self._cpu_mark = (now, cpu)
+        elif now - self._cpu_mark[0] >= 1.0:
+            self._cpu_pct = 100.0 * (cpu - self._cpu_mark[1]) / (now - self._cpu_mark[0])  # of one core, all threads
+            self._cpu_mark = (now, cpu)
+        if self._disconnected:
+            self.status_label.configure(text=f"Recognition service at {DAEMON_ADDRESS} disconnected")
+        elif event:
+            status = f"{event.get('source')} · {event.get('fps', 0):.1f} fps · {event.get('dropped', 0)} dropped · CPU {self._cpu_pct:.0f}%"
+            if event.get("idle"):
+                status += " · idle"
+            if event.get("wake_ms") is not None:
+                status += f" · woke in {event['wake_ms']:.0f} ms"
+            if event.get("profile"):
+                status += f" · {event['profile']} {event.get('detect_scale', 0):.2f}x"
+            if event.get("encodes_saved_per_min"):
+                status += f" · {event['encodes_saved_per_min']} encodes/min saved"
+            self.status_label.configure(text=status)
 
         # Auto-cancel pending registrations after 5 minutes
-        now = time.time()
-        self.pending_unknowns = [p for p in self.pending_unknowns
-                                 if (now - p["created_at"]) <= PENDING_REGISTRATION_TIMEOUT_SEC]
+        with self._lock:
+            self.pending_unknowns = [p for p in self.pending_unknowns
+                                     if (now - p["created_at"]) <= PENDING_REGISTRATION_TIMEOUT_SEC]
 
-        if frame is not None and frame.size > 0:
+        if frame is not None and frame.size > 0 and frame is not self._shown_frame:
+            self._shown_frame = frame  # an idle camera publishes a few frames a second; don't redraw the same one
             try:
-                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                pil_img = Image.fromarray(rgb)
-                photo = ctk.CTkImage(light_image=pil_img, size=MA_VIDEO_SIZE)
-                self.video_label.configure(image=photo, text="")
-                self.video_label.image = photo
-                self.video_label._pil_image = pil_img
+                pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                if self._video_image is None:
+                    self._video_image = ctk.CTkImage(light_image=pil_img, size=MA_VIDEO_SIZE)
+                    self.video_label.configure(image=self._video_image, text="")
+                else:
+                    self._video_image.configure(light_image=pil_img)
             except Exception:
                 pass
 
         # When there is a pending registration, never rebuild the sidebar so the form stays and user can type.
         # Use a longer poll interval (250ms) when pending so we don't risk any refresh while typing.
-        pending_list = list(self.pending_unknowns)
+        with self._lock:
+            pending_list = list(self.pending_unknowns)
         pending_ids = tuple(p["id"] for p in pending_list)
-        poll_delay = 250 if pending_list else 80
+        poll_delay = 250 if pending_list else self.ui_poll_ms
         if pending_list:
             if self._pending_ids_shown == pending_ids:
                 self.after(poll_delay, self._poll_ui)
@@ -1021,14 +3293,7 @@ class MemoryAssistant(ctk.CTkFrame):
             img = pending_item.get("image")
             if img is not None and isinstance(img, np.ndarray) and img.size > 0:
                 try:
-                    img = np.asarray(img).copy()
-                    img_rgb = cv2.cvtColor(cv2.resize(img, (50, 50)), cv2.COLOR_BGR2RGB)
-                    pil_thumb = Image.fromarray(img_rgb.copy())
-                    thumb = ctk.CTkImage(light_image=pil_thumb, size=(50, 50))
-                    lbl = ctk.CTkLabel(card, image=thumb, text="")
-                    lbl.image = thumb
-                    lbl._pil_image = pil_thumb
-                    lbl.pack(side="left", padx=8, pady=8)
+                    ctk.CTkLabel(card, image=self._thumb(img), text="").pack(side="left", padx=8, pady=8)
                 except Exception:
                     pass
             ctk.CTkLabel(card, text="Unknown", font=ctk.CTkFont(size=13, weight="bold")).pack(anchor="w", padx=8, pady=(8, 0))
@@ -1049,14 +3314,7 @@ class MemoryAssistant(ctk.CTkFrame):
             img = person.get("image")
             if img is not None and isinstance(img, np.ndarray) and img.size > 0:
                 try:
-                    img = np.asarray(img).copy()
-                    img_rgb = cv2.cvtColor(cv2.resize(img, (50, 50)), cv2.COLOR_BGR2RGB)
-                    pil_thumb = Image.fromarray(img_rgb.copy())
-                    thumb = ctk.CTkImage(light_image=pil_thumb, size=(50, 50))
-                    lbl = ctk.CTkLabel(card, image=thumb, text="")
-                    lbl.image = thumb
-                    lbl._pil_image = pil_thumb
-                    lbl.pack(side="left", padx=8, pady=8)
+                    ctk.CTkLabel(card, image=self._thumb(img, person.get("key")), text="").pack(side="left", padx=8, pady=8)
                 except Exception:
                     pass
             name = person.get("name", "?")
@@ -1092,33 +3350,1361 @@ class MemoryAssistant(ctk.CTkFrame):
         img = image_source.get("image") if isinstance(image_source, dict) else image_source
         path = ""
         if img is not None and HAS_NUMPY and isinstance(img, np.ndarray) and img.size > 0:
-            os.makedirs(IMAGE_FOLDER, exist_ok=True)
-            path = os.path.join(IMAGE_FOLDER, f"ma_kb_{int(time.time())}.jpg")
             try:
-                img = np.asarray(img, dtype=np.uint8).copy(order="C")
-                if img.ndim == 2:
-                    img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-                elif img.shape[-1] == 4:
-                    img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-                cv2.imwrite(path, img)
+                path = ingest_image(img)
             except Exception:
                 path = ""
         new_person = {"name": n, "relation": r, "notes": "", "image": path}
         self.app.db["people"].append(new_person)
-        save_db(self.app.db)
+        self.app.save()
+        self.app.people_index.add(new_person)
         self._reload_known_faces()
-        if pending_item is not None and pending_item in self.pending_unknowns:
-            self.pending_unknowns.remove(pending_item)
+        with self._lock:
+            if pending_item is not None and pending_item in self.pending_unknowns:
+                self.pending_unknowns.remove(pending_item)
         messagebox.showinfo("Registered", f"Added {n} as {r}.")
 
     def _cancel_pending_registration(self, pending_item):
         """Cancel the current registration; pending is removed."""
-        if pending_item in self.pending_unknowns:
-            self.pending_unknowns.remove(pending_item)
+        with self._lock:
+            if pending_item in self.pending_unknowns:
+                self.pending_unknowns.remove(pending_item)
         self._last_sidebar_state = None
 
 
+# ---------------- VOICE ASSISTANT ----------------
+OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434").rstrip("/")  # any Ollama-compatible endpoint
+LLM_MODEL = os.environ.get("MA_LLM_MODEL", "llama3.2")
+LLM_TIMEOUT_SEC = 60
+STT_ENGINE = os.environ.get("MA_STT_ENGINE", "sphinx")  # "sphinx" (offline, needs pocketsphinx) or "google"
+VOICE_PHRASE_LIMIT_SEC = 6
+LLM_KEEP_ALIVE = "30m"   # how long the model (and its cached prompt prefix) stays loaded between questions
+LLM_WARM_QUESTION = "Who is this?"  # a real, short user turn: the model only evaluates a prompt it must answer
+
+WHO_IS_THIS = re.compile(r"\b(who\s+is\s+(this|that|he|she|it)|who'?s\s+(this|that)|who\s+am\s+i\s+(talking|speaking)\s+to)\b", re.I)
+
+def person_prompt(person):
+    """System prompt for questions about the person currently in front of the camera (or nobody)."""
+    base = ("You are a gentle memory assistant helping someone with memory loss. "
+            "Answer in one or two short, warm sentences.")
+    if not person:
+        return base + " Nobody familiar is in front of the camera right now."
+    text = f"{base} The person in front of them is {person.get('name')}, their {person.get('rel') or 'acquaintance'}."
+    notes = (person.get("notes") or "").strip()
+    return text + (f" What the family wrote about them: {notes}" if notes else "")
+
+def quick_answer(question, person):
+    """Answer "who is this?" straight from the profile, without waiting for the model."""
+    if not WHO_IS_THIS.search(question or ""):
+        return None
+    if not person:
+        return "I don't recognise anyone in front of the camera right now."
+    answer = f"This is {person.get('name')}, your {person.get('rel') or 'acquaintance'}."
+    notes = (person.get("notes") or "").strip()
+    return f"{answer} {notes}" if notes else answer
+
+def llm_chat_stream(system, question, num_predict=None):
+    """Yield the answer to question from an Ollama-compatible /api/chat, text chunk by text chunk as it streams.
+
+    The system prompt is always sent as the first message. The server keeps the evaluated tokens of its last
+    prompt and re-uses the longest common prefix of the next one, so once a person's system prompt has been
+    evaluated (see VoiceAssistant._warm) a question about them only costs its own tokens."""
+    body = {"model": LLM_MODEL, "stream": True, "keep_alive": LLM_KEEP_ALIVE,
+            "messages": [{"role": "system", "content": system}, {"role": "user", "content": question}]}
+    if num_predict is not None:
+        body["options"] = {"num_predict": num_predict}
+    req = urllib.request.Request(OLLAMA_URL + "/api/chat", data=json.dumps(body).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=LLM_TIMEOUT_SEC) as resp:
+        for line in resp:
+            line = line.strip()
+            if not line:
+                continue
+            msg = json.loads(line)
+            if msg.get("error"):
+                raise RuntimeError(msg["error"])
+            text = (msg.get("message") or {}).get("content")
+            if text:
+                yield text
+            if msg.get("done"):
+                return
+
+class VoiceAssistant:
+    """Microphone → speech-to-text → local LLM → streamed answer, entirely off the Tk thread.
+
+    An asyncio loop on a daemon thread owns the pipeline; blocking work (microphone calibration, STT, HTTP)
+    runs in its executor. When the recognized person changes, a one-token question with their system prompt is
+    sent, so the model is loaded and the prompt is already evaluated in the server's prefix cache; a later
+    question about them then only pays for its own tokens.
+    Results arrive on self.events as ("heard" | "start" | "token" | "done" | "error", text) for the UI to drain.
+    """
+    def __init__(self):
+        self.events = queue.Queue()
+        self._loop = None
+        self._thread = None
+        self._warming = set()  # system prompts being evaluated right now
+        self._person = None
+        self._stop_listening = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            ready.set()
+            self._loop.run_forever()
+        self._thread = threading.Thread(target=run, name="voice-assistant", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def _submit(self, coro):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def set_person(self, person):
+        """Current person in view (detected-list entry or None); precomputes their prompt context."""
+        key = (person or {}).get("name"), (person or {}).get("rel"), (person or {}).get("notes")
+        if key == ((self._person or {}).get("name"), (self._person or {}).get("rel"), (self._person or {}).get("notes")):
+            return
+        self._person = dict(person) if person else None
+        self._submit(self._warm(person_prompt(self._person)))
+
+    async def _warm(self, prompt):
+        """Have the server evaluate prompt now. An empty prompt would only load the model, so this asks a real
+        (short) question and reads a single token of the answer; the prefix shared with later questions is the
+        system message and the chat template around it, which is what the server then finds cached."""
+        if prompt in self._warming:
+            return
+        self._warming.add(prompt)
+        try:
+            await self._loop.run_in_executor(None, lambda: list(llm_chat_stream(prompt, LLM_WARM_QUESTION, num_predict=1)))
+        except Exception:
+            pass  # the model may be down; the question itself will report it
+        finally:
+            self._warming.discard(prompt)
+
+    def reset(self):
+        """Drop the current person (e.g. when the signed-in user changes)."""
+        self._person = None
+
+    def ask(self, question):
+        """Answer a typed or transcribed question; returns immediately."""
+        question = (question or "").strip()
+        if question:
+            self._submit(self._answer(question))
+
+    async def _answer(self, question):
+        self.events.put(("start", question))
+        person = self._person
+        quick = quick_answer(question, person)
+        if quick:
+            self.events.put(("token", quick))
+            self.events.put(("done", ""))
+            return
+        prompt = person_prompt(person)
+
+        def work():
+            for text in llm_chat_stream(prompt, question):
+                self.events.put(("token", text))
+        try:
+            await self._loop.run_in_executor(None, work)
+            self.events.put(("done", ""))
+        except Exception as e:
+            self.events.put(("error", f"Assistant unavailable ({e.__class__.__name__})."))
+
+    @property
+    def listening(self):
+        return self._stop_listening is not None
+
+    def toggle_listening(self):
+        """Start or stop continuous microphone capture; each spoken phrase is transcribed and answered."""
+        if not HAS_SPEECH:
+            self.events.put(("error", "Install SpeechRecognition and PyAudio for voice questions."))
+            return
+        if self._stop_listening is not None:
+            stop, self._stop_listening = self._stop_listening, None
+            stop(wait_for_stop=False)
+            return
+        self._submit(self._start_listening())
+
+    async def _start_listening(self):
+        recognizer = sr.Recognizer()
+
+        def open_mic():
+            mic = sr.Microphone()
+            with mic as source:
+                recognizer.adjust_for_ambient_noise(source, duration=0.5)
+            return mic
+        try:
+            mic = await self._loop.run_in_executor(None, open_mic)
+        except Exception as e:
+            self.events.put(("error", f"Microphone unavailable ({e.__class__.__name__})."))
+            return
+
+        def on_phrase(rec, audio):  # called on speech_recognition's capture thread
+            asyncio.run_coroutine_threadsafe(self._transcribe(rec, audio), self._loop)
+        self._stop_listening = recognizer.listen_in_background(mic, on_phrase, phrase_time_limit=VOICE_PHRASE_LIMIT_SEC)
+
+    async def _transcribe(self, recognizer, audio):
+        def stt():
+            if STT_ENGINE == "google":
+                return recognizer.recognize_google(audio)
+            return recognizer.recognize_sphinx(audio)
+        try:
+            text = await self._loop.run_in_executor(None, stt)
+        except Exception:
+            return  # unintelligible phrase or STT engine missing
+        if text:
+            self.events.put(("heard", text))
+            await self._answer(text)
+
+def serve_llm_stub(port=11434, delay=0.02):
+    """Minimal Ollama-compatible /api/chat that streams a canned reply, for trying the assistant without a model.
+    Like the real server it remembers its last prompt and reports in prompt_eval_count only the characters past
+    the prefix shared with it (a stand-in for tokens), so prefix-cache reuse can be checked."""
+    last = {"prompt": ""}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if self.path != "/api/chat":
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            messages = body.get("messages") or []
+            prompt = "".join(f"<{m.get('role')}>{m.get('content', '')}" for m in messages)
+            shared = len(os.path.commonprefix([prompt, last["prompt"]]))
+            last["prompt"] = prompt
+            n = (body.get("options") or {}).get("num_predict")
+            question = messages[-1].get("content", "") if messages else ""
+            words = f"(stub) You asked: {question}".split(" ")
+            for w in words[:n] if n else words:
+                chunk = {"message": {"role": "assistant", "content": w + " "}, "done": False}
+                self.wfile.write((json.dumps(chunk) + "\n").encode())
+                self.wfile.flush()
+                time.sleep(delay)
+            done = {"message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "stop",
+                    "prompt_eval_count": len(prompt) - shared}
+            self.wfile.write((json.dumps(done) + "\n").encode())
+
+        def log_message(self, *args):
+            pass
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"LLM stub listening on http://127.0.0.1:{port}")
+    server.serve_forever()
+
+# ---------------- RECURRING VISITORS ----------------
+UNKNOWN_SIGHTINGS_FILE = "unknown_sightings.jsonl"   # one metadata line per captured stranger
+UNKNOWN_ENCODINGS_FILE = "unknown_sightings.f32"     # matching raw float32 rows, 128 per sighting
+UNKNOWN_IMAGE_FOLDER = os.path.join(IMAGE_FOLDER, "unknown")
+CLUSTER_MIN_SAMPLES = 3       # sightings within tolerance of a sighting for it to seed a cluster (DBSCAN min_samples)
+CLUSTER_CHUNK = 256           # rows per distance block; scratch is ~5 bytes x CLUSTER_CHUNK x N, never N x N
+CLUSTER_REGISTER_SAMPLES = 5  # sample photos stored with a person registered from a cluster
+
+class UnknownSightingStore:
+    """Append-only store of stranger sightings: encodings in a raw float32 file, metadata in JSON lines."""
+    def __init__(self, meta_path=UNKNOWN_SIGHTINGS_FILE, enc_path=UNKNOWN_ENCODINGS_FILE, image_folder=UNKNOWN_IMAGE_FOLDER):
+        self.meta_path = meta_path
+        self.enc_path = enc_path
+        self.image_folder = image_folder
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def add(self, encoding, crop, source=None, backend=None):
+        """Persist one sighting (crop saved as JPEG). Safe to call from recognition workers."""
+        enc = np.asarray(encoding, dtype=np.float32).reshape(-1)
+        if enc.size != 128:
+            return None
+        path = ""
+        if crop is not None and crop.size > 0:
+            os.makedirs(self.image_folder, exist_ok=True)
+            path = os.path.join(self.image_folder, f"sighting_{int(time.time() * 1000)}_{next(self._seq)}.jpg")
+            if not cv2.imwrite(path, crop):
+                path = ""
+        record = {"id": uuid.uuid4().hex[:16], "ts": time.time(), "source": source, "image": path,
+                  "backend": backend or get_embedding_backend().name}
+        with self._lock:
+            with open(self.enc_path, "ab") as f:
+                f.write(enc.tobytes())
+            with open(self.meta_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+    def load(self):
+        """Returns (encodings (N, 128) float32 memmap or array, records list). Every record has a stable "id"."""
+        with self._lock:
+            return self._load()
+
+    def _load(self):
+        records = []
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        records.append({"ts": 0, "source": None, "image": ""})
+        for r in records:
+            if not r.get("id"):  # written before sightings had ids; derived from content so it stays the same
+                r["id"] = hashlib.sha1(json.dumps(r, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        rows = os.path.getsize(self.enc_path) // (128 * 4) if os.path.exists(self.enc_path) else 0
+        n = min(rows, len(records))  # a crash between the two appends leaves at most one unmatched row
+        if not n:
+            return np.zeros((0, 128), np.float32), []
+        encodings = np.memmap(self.enc_path, dtype=np.float32, mode="r", shape=(rows, 128))[:n]
+        return encodings, records[:n]
+
+    def remove(self, ids, delete_images=True):
+        """Drop sightings by id (e.g. once registered), rewriting both files. Ids already gone are ignored, and
+        the lock is held throughout so a sighting added meanwhile by a recognition worker is not lost."""
+        drop = set(ids)
+        with self._lock:
+            encodings, records = self._load()
+            keep = [i for i, r in enumerate(records) if r["id"] not in drop]
+            if len(keep) == len(records):
+                return 0
+            kept_enc = np.array(encodings[keep], dtype=np.float32) if keep else np.zeros((0, 128), np.float32)
+            del encodings
+            with open(self.enc_path + ".tmp", "wb") as f:
+                f.write(kept_enc.tobytes())
+            with open(self.meta_path + ".tmp", "w") as f:
+                for i in keep:
+                    f.write(json.dumps(records[i]) + "\n")
+            os.replace(self.enc_path + ".tmp", self.enc_path)
+            os.replace(self.meta_path + ".tmp", self.meta_path)
+        gone = [r for r in records if r["id"] in drop]
+        if delete_images:
+            for r in gone:
+                if r.get("image") and os.path.exists(r["image"]):
+                    try:
+                        os.remove(r["image"])
+                    except OSError:
+                        pass
+        return len(gone)
+
+def unknown_sighting_store(user_id=None):
+    """user_id's stranger sightings (the device-wide store when None), so recurring visitors are only clustered
+    and shown for the account whose sessions captured them."""
+    if not user_id:
+        return UnknownSightingStore()
+    base = os.path.join(SHARD_FOLDER, f"{user_id}.unknown_sightings")
+    return UnknownSightingStore(base + ".jsonl", base + ".f32", os.path.join(UNKNOWN_IMAGE_FOLDER, user_id))
+
+def migrate_legacy_sightings(user_id):
+    """Hand sightings captured before accounts existed to user_id, like migrate_legacy_people does with people.
+    Only if that account has none yet; the photos stay where they are."""
+    legacy, mine = UnknownSightingStore(), unknown_sighting_store(user_id)
+    if not os.path.exists(legacy.meta_path) or os.path.exists(mine.meta_path):
+        return False
+    os.makedirs(os.path.dirname(mine.meta_path), exist_ok=True)
+    with legacy._lock:
+        if os.path.exists(legacy.enc_path):
+            os.replace(legacy.enc_path, mine.enc_path)
+        os.replace(legacy.meta_path, mine.meta_path)
+    return True
+
+def _find_roots(parent, idx):
+    """Vectorized union-find lookup with path compression."""
+    r = parent[idx]
+    while True:
+        rr = parent[r]
+        if np.array_equal(rr, r):
+            break
+        r = rr
+    parent[idx] = r
+    return r
+
+def _neighbor_blocks(encodings, eps, chunk):
+    """Yield (start, mask) where mask[k, j] says rows start+k and j are within eps. One chunk x N block at a time."""
+    x = np.asarray(encodings, dtype=np.float32)
+    sq = np.einsum("ij,ij->i", x, x)
+    eps2 = eps * eps
+    for start in range(0, len(x), chunk):
+        block = x[start:start + chunk]
+        d2 = block @ x.T  # the only float32 chunk x N array; the rest is done in place
+        d2 *= -2.0
+        d2 += sq[start:start + len(block), None]
+        d2 += sq[None, :]
+        mask = d2 < eps2
+        del d2
+        yield start, mask
+
+def cluster_sightings(encodings, eps=None, min_samples=CLUSTER_MIN_SAMPLES, chunk=CLUSTER_CHUNK):
+    """DBSCAN over face encodings with chunked, vectorized distances. Returns labels (-1 = noise).
+
+    Pass 1 counts neighbours to find core sightings; pass 2 unions each core sighting with its core
+    neighbours and attaches border sightings to a neighbouring core. Scratch is one float32 and one bool
+    chunk x N block (~5 bytes x chunk x N: ~130 MB for 100k sightings at the default chunk) plus per-row
+    neighbour lists, instead of the 40 GB a full distance matrix would need.
+    """
+    eps = get_embedding_backend().threshold if eps is None else eps
+    n = len(encodings)
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+    counts = np.zeros(n, dtype=np.int64)
+    for start, mask in _neighbor_blocks(encodings, eps, chunk):
+        counts[start:start + len(mask)] = mask.sum(axis=1)  # includes the sighting itself
+    core = counts >= min_samples
+    parent = np.arange(n, dtype=np.int32)
+    border_of = np.full(n, -1, dtype=np.int32)
+    for start, mask in _neighbor_blocks(encodings, eps, chunk):
+        mask &= core[None, :]
+        # Rows whose core neighbours already share one root need no union; this keeps dense clusters cheap.
+        # Roots only ever merge, so ones taken at the start of the block are still good enough for that test.
+        roots_all = _find_roots(parent, np.arange(n, dtype=np.int32))
+        for k in np.flatnonzero(mask.any(axis=1)):
+            i = start + k
+            nbrs = np.flatnonzero(mask[k])
+            if not core[i]:
+                border_of[i] = nbrs[0]
+                continue
+            r = roots_all[nbrs]
+            if r.min() != r.max():
+                roots = np.unique(_find_roots(parent, nbrs))
+                parent[roots] = roots.min()
+    roots = _find_roots(parent, np.arange(n))
+    labels = np.full(n, -1, dtype=np.int64)
+    _, labels[core] = np.unique(roots[core], return_inverse=True)
+    has_core = border_of >= 0
+    labels[has_core] = labels[border_of[has_core]]
+    return labels
+
+def build_visitor_clusters(store, eps=None, min_samples=CLUSTER_MIN_SAMPLES):
+    """Cluster stored sightings into recurring visitors, largest first.
+
+    Each cluster: {"ids" (sighting ids), "count", "first_seen", "last_seen", "samples": image paths nearest the centre first,
+    "encodings": {image path: encoding}}.
+    """
+    encodings, records = store.load()
+    # Encodings from different backends live in different spaces; only cluster the current backend's.
+    backend = get_embedding_backend().name
+    rows = np.array([i for i, r in enumerate(records) if r.get("backend", "dlib") == backend], dtype=np.int64)
+    labels = cluster_sightings(encodings[rows] if len(rows) < len(records) else encodings, eps, min_samples)
+    clusters = []
+    for label in range(int(labels.max()) + 1 if len(labels) else 0):
+        idx = rows[labels == label]
+        enc = np.asarray(encodings[idx], dtype=np.float32)
+        order = idx[np.argsort(np.linalg.norm(enc - enc.mean(axis=0), axis=1))]
+        samples = [records[i]["image"] for i in order if records[i].get("image") and os.path.exists(records[i]["image"])]
+        ts = [records[i].get("ts", 0) for i in idx]
+        clusters.append({
+            "ids": [records[i]["id"] for i in idx], "count": len(idx), "first_seen": min(ts), "last_seen": max(ts),
+            "samples": samples,
+            "encodings": {records[i]["image"]: np.array(encodings[i], dtype=np.float32) for i in order if records[i].get("image")},
+        })
+    clusters.sort(key=lambda c: c["count"], reverse=True)
+    return clusters
+
+class Visitors(ctk.CTkFrame):
+    """Recurring unknown visitors, clustered from stored sightings, so each can be registered once."""
+    def __init__(self, app):
+        super().__init__(app, fg_color="black")
+        self.app = app
+        self._clustering = False
+        self._again = False     # refresh asked for while clustering; run again once done
+        self._buttons = []
+
+        top = ctk.CTkFrame(self, fg_color="black")
+        top.pack(fill="x", padx=20, pady=20)
+        btn(top, "← Back", lambda: self.app.show(Home), 140).pack(side="left")
+        btn(top, "Refresh", self.refresh, 140).pack(side="left", padx=12)
+        self.status = ctk.CTkLabel(top, text="", font=ctk.CTkFont(size=13), text_color="#888")
+        self.status.pack(side="left", padx=12)
+
+        self.scroll = ctk.CTkScrollableFrame(self)
+        self.scroll.pack(expand=True, fill="both", padx=40, pady=(0, 20))
+
+    @property
+    def store(self):
+        return self.app.sightings  # the signed-in account's sightings
+
+    def on_show(self):
+        self.refresh()
+
+    def refresh(self):
+        """Cluster on a background thread (can take a while for months of sightings), then render."""
+        if self._clustering:
+            self._again = True
+            return
+        self._clustering = True
+        for b in self._buttons:  # cards are stale until the new clusters are rendered
+            b.configure(state="disabled")
+        self.status.configure(text="Grouping sightings…")
+        result = {}
+
+        def work():
+            try:
+                result["clusters"] = build_visitor_clusters(self.store)
+            except Exception:
+                result["clusters"] = []
+        t = threading.Thread(target=work, daemon=True)
+        t.start()
+
+        def wait():
+            if t.is_alive():
+                self.after(100, wait)
+                return
+            self._clustering = False
+            if self._again:
+                self._again = False
+                self.refresh()
+                return
+            self._render(result.get("clusters", []))
+        self.after(100, wait)
+
+    def _render(self, clusters):
+        for w in self.scroll.winfo_children():
+            w.destroy()
+        self._buttons = []
+        self.status.configure(text=f"{len(clusters)} recurring visitor(s)" if clusters else "No recurring visitors yet")
+        for cluster in clusters:
+            card = ctk.CTkFrame(self.scroll, fg_color="#111", corner_radius=20)
+            card.pack(fill="x", pady=10)
+            thumbs = ctk.CTkFrame(card, fg_color="transparent")
+            thumbs.pack(anchor="w", padx=15, pady=(10, 4))
+            for path in cluster["samples"][:CLUSTER_REGISTER_SAMPLES]:
+                try:
+                    pil_img = Image.open(path).convert("RGB").resize((65, 65))
+                    photo = ctk.CTkImage(light_image=pil_img, size=(65, 65))
+                    lbl = ctk.CTkLabel(thumbs, image=photo, text="")
+                    lbl.image = photo
+                    lbl._pil_image = pil_img
+                    lbl.pack(side="left", padx=4)
+                except Exception:
+                    continue
+            seen = time.strftime("%d %b %Y %H:%M", time.localtime(cluster["last_seen"]))
+            ctk.CTkLabel(card, text=f"Seen {cluster['count']} times · last {seen}",
+                         font=ctk.CTkFont(size=14, weight="bold")).pack(anchor="w", padx=15)
+            row = ctk.CTkFrame(card, fg_color="transparent")
+            row.pack(anchor="w", padx=15, pady=(6, 12))
+            name_entry = ctk.CTkEntry(row, width=200, placeholder_text="Name")
+            name_entry.pack(side="left", padx=(0, 8))
+            rel_entry = ctk.CTkEntry(row, width=200, placeholder_text="Relationship")
+            rel_entry.pack(side="left", padx=(0, 8))
+            b = ctk.CTkButton(row, text="Register", width=100, height=28, corner_radius=14,
+                              fg_color="white", text_color="black",
+                              command=lambda c=cluster, ne=name_entry, re=rel_entry: self._register(c, ne, re))
+            b.pack(side="left")
+            self._buttons.append(b)
+
+    def _register(self, cluster, name_entry, rel_entry):
+        """Register the visitor with the sample nearest the cluster centre as photo and the next best as extra samples."""
+        n = name_entry.get().strip()
+        r = rel_entry.get().strip() or "Stranger"
+        if not n:
+            messagebox.showwarning("Register", "Please enter a name.")
+            return
+        if not cluster["samples"]:
+            messagebox.showwarning("Register", "No photos were kept for this visitor.")
+            return
+        kept = []
+        for src in cluster["samples"][:CLUSTER_REGISTER_SAMPLES]:
+            try:
+                dst = ingest_image(src)
+            except (OSError, ValueError):
+                continue
+            if all(dst != path for path, _ in kept):
+                kept.append((dst, cluster["encodings"].get(src)))
+        if not kept:
+            return
+        # Seed the encodings cache from the sightings so the new samples are not re-encoded.
+        backend, cache_path = get_embedding_backend().name, encodings_cache_path(self.app.db)
+        cache = _load_encodings_cache(backend, cache_path)
+        for path, enc in kept:
+            if enc is not None:
+                cache[path] = {"mtime": os.path.getmtime(path), "encoding": enc}
+        _save_encodings_cache(cache, backend, cache_path)
+        person = {
+            "name": n, "relation": r, "notes": "",
+            "image": kept[0][0],
+            "samples": [path for path, _ in kept[1:]],
+        }
+        self.app.db["people"].append(person)
+        self.app.save()
+        self.app.people_index.add(person)
+        self.store.remove(cluster["ids"])
+        self.app.frames[MemoryAssistant]._reload_known_faces()
+        messagebox.showinfo("Registered", f"Added {n} as {r} with {len(kept)} photo(s).")
+        self.refresh()
+
+
+# ---------------- BULK IMPORT ----------------
+IMPORT_BATCH = 200                         # people written per database/cache transaction
+IMPORT_CHECKPOINT_FILE = "import_checkpoint.json"
+IMPORT_REPORT_FILE = "import_report.csv"
+IMPORT_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+def read_import_manifest(source):
+    """[(key, image path, name, relation, notes)] from a folder of photos or a CSV with image,name[,relation,notes].
+
+    In a folder, the name comes from the file name ("mary_jones-2.jpg" -> "Mary Jones") and a
+    sub-folder, if any, becomes the relation. CSV image paths are relative to the CSV.
+    """
+    items = []
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for fn in sorted(files):
+                if not fn.lower().endswith(IMPORT_EXTENSIONS):
+                    continue
+                path = os.path.join(root, fn)
+                stem = re.sub(r"[-_ ]*\d+$", "", os.path.splitext(fn)[0])
+                name = re.sub(r"[-_]+", " ", stem).strip().title()
+                rel_dir = os.path.relpath(root, source)
+                relation = "" if rel_dir == "." else os.path.basename(rel_dir)
+                items.append((os.path.relpath(path, source), path, name, relation, ""))
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                img = (row.get("image") or "").strip()
+                if not img:
+                    continue
+                path = img if os.path.isabs(img) else os.path.join(base, img)
+                items.append((img, path, (row.get("name") or "").strip(), (row.get("relation") or "").strip(),
+                              (row.get("notes") or "").strip()))
+    return items
+
+def _enroll_one(item):
+    """Process-pool worker: normalize one photo in memory, find and encode its face, and store the photo only
+    if it will be imported (one face and a name), so rejected photos leave nothing behind in IMAGE_FOLDER."""
+    key, path, name, relation, notes = item
+    out = {"key": key, "name": name, "relation": relation, "notes": notes, "image": "", "faces": 0, "encoding": None, "error": ""}
+    try:
+        data = normalize_image(path)
+        image = face_recognition.load_image_file(io.BytesIO(data))
+        locs = face_recognition.face_locations(image)
+        out["faces"] = len(locs)
+        if len(locs) == 1:
+            out["encoding"] = get_embedding_backend().encode([(image, locs)])[0][0].tolist()
+            if name:
+                out["image"] = store_image(data)
+    except Exception as e:
+        out["error"] = f"{e.__class__.__name__}: {e}"
+    return out
+
+def bulk_import(source, workers=None, checkpoint_path=IMPORT_CHECKPOINT_FILE, report_path=IMPORT_REPORT_FILE, progress=print, user_id=None):
+    """Import many people at once. Decoding and encoding run across a process pool; people and encodings are
+    written IMPORT_BATCH at a time together with a checkpoint, so an interrupted import resumes where it stopped.
+
+    Photos with no face or several faces are skipped and listed in the report. People go into user_id's shard
+    (the device-wide list if None). Returns counts per outcome.
+    """
+    if not HAS_FACE_RECOGNITION:
+        raise RuntimeError("Bulk import needs face_recognition: pip install face_recognition")
+    items = read_import_manifest(source)
+    src_key = f"{user_id}:{os.path.abspath(source)}" if user_id else os.path.abspath(source)
+    checkpoint = {}
+    if os.path.exists(checkpoint_path):
+        try:
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (ValueError, OSError):
+            checkpoint = {}
+    done = checkpoint.get(src_key, {})
+    todo = [it for it in items if it[0] not in done]
+    progress(f"{len(items)} photos in manifest, {len(items) - len(todo)} already imported, {len(todo)} to go")
+
+    db = load_db(user_id)
+    known_images = {p.get("image") for p in db.get("people", [])}
+    backend = get_embedding_backend().name  # workers inherit the same configuration, so encode with the same backend
+    cache_path = encodings_cache_path(db)
+    cache = _load_encodings_cache(backend, cache_path)
+    counts = collections.Counter(done.values())
+    new_report = not os.path.exists(report_path)
+    report_f = open(report_path, "a", newline="", encoding="utf-8")
+    report = csv.writer(report_f)
+    if new_report:
+        report.writerow(["source", "key", "outcome", "faces", "detail"])
+    pending = []
+
+    def commit():
+        db_people = db.setdefault("people", [])
+        for r in pending:
+            if r["outcome"] != "imported":
+                continue
+            db_people.append({"name": r["name"], "relation": r["relation"], "notes": r["notes"], "image": r["image"]})
+            cache[r["image"]] = {"mtime": os.path.getmtime(r["image"]), "encoding": np.asarray(r["encoding"], dtype=np.float32)}
+        save_db(db)
+        _save_encodings_cache(cache, backend, cache_path)
+        for r in pending:
+            done[r["key"]] = r["outcome"]
+            if r["outcome"] != "imported":
+                report.writerow([src_key, r["key"], r["outcome"], r["faces"], r["error"]])
+        report_f.flush()
+        checkpoint[src_key] = done
+        tmp = checkpoint_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, checkpoint_path)
+        pending.clear()
+
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            for n, r in enumerate(pool.map(_enroll_one, todo, chunksize=4), 1):
+                if r["error"]:
+                    r["outcome"] = "error"
+                elif r["faces"] == 0:
+                    r["outcome"] = "no_face"
+                elif r["faces"] > 1:
+                    r["outcome"] = "multiple_faces"
+                elif not r["name"]:
+                    r["outcome"] = "no_name"
+                elif r["image"] in known_images:
+                    r["outcome"] = "duplicate"
+                else:
+                    r["outcome"] = "imported"
+                    known_images.add(r["image"])
+                counts[r["outcome"]] += 1
+                pending.append(r)
+                if len(pending) >= IMPORT_BATCH:
+                    commit()
+                    progress(f"{n}/{len(todo)} processed  " + "  ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    finally:
+        if pending:
+            commit()
+        report_f.close()
+    progress("Done: " + "  ".join(f"{k}={v}" for k, v in sorted(counts.items())) + f"  (problems listed in {report_path})")
+    return dict(counts)
+
+# ---------------- GALLERY BUNDLES ----------------
+BUNDLE_MAGIC = b"MMGALv1\n"  # first and last 8 bytes of every bundle file
+BUNDLE_ALIGN = 64            # the encodings matrix starts here, so the mapped float32 rows are aligned
+BUNDLE_THUMB_SIZE = 96       # longest side of the JPEG preview stored for every person
+
+def gallery_pack_path(db):
+    """Encodings-only bundle kept next to db's encodings cache, written when a full bundle is imported."""
+    owner = (db or {}).get("owner")
+    return os.path.join(SHARD_FOLDER, f"{owner}.gallery") if owner else "gallery.pack"
+
+def sync_state_path(db):
+    owner = (db or {}).get("owner")
+    return os.path.join(SHARD_FOLDER, f"{owner}.sync.json") if owner else "gallery_sync.json"
+
+def load_sync_state(db):
+    """db's sync state: {"device", "known": {id: hash last imported or pushed here}, "targets": {path: ...}}."""
+    state = {}
+    path = sync_state_path(db)
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (ValueError, OSError):
+            state = {}
+    state.setdefault("device", uuid.uuid4().hex[:12])
+    if "known" not in state:  # written before "known" existed: what was agreed with any target is the best guess
+        state["known"] = {pid: h for t in state.get("targets", {}).values() for pid, h in t.get("synced", {}).items()}
+    state.setdefault("targets", {})
+    return state
+
+def save_sync_state(db, state):
+    path = sync_state_path(db)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+def remember_hashes(state, hashes):
+    """Record id -> hash (None for removed) in state["known"], the versions this device last imported or pushed."""
+    known = state["known"]
+    for pid, h in hashes.items():
+        if h is None:
+            known.pop(pid, None)
+        else:
+            known[pid] = h
+
+def _photos(person):
+    return [p for p in [person.get("image")] + list(person.get("samples") or []) if p]
+
+def person_hash(person):
+    """Content hash of a person record. Photos count by their content digest rather than their path, so the
+    same person hashes the same on every device and a copied or re-imported photo is not a change."""
+    rec = {k: v for k, v in person.items() if k not in ("image", "samples")}
+    rec["photos"] = [image_digest(p) or p for p in _photos(person)]
+    return hashlib.sha256(json.dumps(rec, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+
+def gallery_manifest(db):
+    """person id -> person_hash for every person in db: what a peer needs to ask for a delta."""
+    return {p["id"]: person_hash(p) for p in _ensure_person_ids(db).get("people", [])}
+
+def _thumbnail_jpeg(path):
+    try:
+        with Image.open(path) as im:
+            im = im.convert("RGB")
+            im.thumbnail((BUNDLE_THUMB_SIZE, BUNDLE_THUMB_SIZE))
+            buf = io.BytesIO()
+            im.save(buf, format="JPEG", quality=80)
+            return buf.getvalue()
+    except Exception:
+        return None
+
+def _write_bundle(path, header, vectors, dim, blobs=()):
+    """Write a bundle: magic, the float32 encodings matrix at BUNDLE_ALIGN, raw blobs, JSON header, header offset, magic.
+    blobs is an iterable of (key, bytes); each key's [offset, length] is added to header["blobs"]. The file is
+    written beside path and renamed into place, so readers (and sync peers) never see a partial bundle."""
+    header = dict(header, dim=dim, rows=len(vectors), blobs={})
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(BUNDLE_MAGIC.ljust(BUNDLE_ALIGN, b"\0"))
+        if vectors:
+            f.write(np.asarray(vectors, dtype="<f4").reshape(len(vectors), dim).tobytes())
+        for key, data in blobs:
+            if data and key not in header["blobs"]:
+                header["blobs"][key] = [f.tell(), len(data)]
+                f.write(data)
+        offset = f.tell()
+        f.write(json.dumps(header, separators=(",", ":")).encode("utf-8"))
+        f.write(offset.to_bytes(8, "little") + BUNDLE_MAGIC)
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+class GalleryBundle:
+    """Read-only view of a gallery bundle file.
+
+    The file is memory-mapped: `encodings` is a zero-copy float32 view of the matrix, and photos and thumbnails
+    are sliced out of the mapping only when asked for, so opening even a large bundle costs one JSON header parse.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._mm[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC or self._mm[-len(BUNDLE_MAGIC):] != BUNDLE_MAGIC:
+                raise ValueError(f"{path} is not a gallery bundle")
+            start = int.from_bytes(self._mm[-16:-8], "little")
+            self.header = json.loads(self._mm[start:len(self._mm) - 16].decode("utf-8"))
+        except Exception:
+            self.close()
+            raise
+        h = self.header
+        self.backend, self.dim = h.get("backend"), h.get("dim", 128)
+        self.people = [e["record"] for e in h.get("people", [])]
+        self.hashes = [e["hash"] for e in h.get("people", [])]
+        self.removed = list(h.get("removed", []))
+        self.manifest = dict(h.get("manifest", {}))
+        self.delta = bool(h.get("delta"))
+        self._rows = h.get("encodings", {})  # image digest -> row
+        self.encodings = np.frombuffer(self._mm, dtype="<f4", count=h.get("rows", 0) * self.dim,
+                                       offset=BUNDLE_ALIGN).reshape(-1, self.dim) if HAS_NUMPY else None
+
+    def __len__(self):
+        return len(self.people)
+
+    def encoding(self, digest):
+        """Encoding stored for the photo with this content digest (a float32 copy), or None."""
+        row = self._rows.get(digest)
+        return None if row is None or self.encodings is None else np.array(self.encodings[row])
+
+    def _blob(self, key):
+        span = self.header.get("blobs", {}).get(key)
+        return self._mm[span[0]:span[0] + span[1]] if span else None
+
+    def image_bytes(self, digest):
+        return self._blob("img:" + digest)
+
+    def thumbnail(self, index):
+        """PIL preview of the index-th person, or None if the bundle has none."""
+        data = self._blob(f"thumb:{self.people[index].get('id')}")
+        return Image.open(io.BytesIO(data)) if data else None
+
+    def close(self):
+        self.encodings = None  # drop the exported view first, or the mapping refuses to close
+        try:
+            if getattr(self, "_mm", None) is not None:
+                self._mm.close()
+        except BufferError:
+            pass  # rows are still referenced elsewhere; the mapping goes when they do
+        self._f.close()
+
+def open_gallery_pack(db, backend_name):
+    """db's gallery pack if it exists and holds backend_name encodings, else None."""
+    path = gallery_pack_path(db)
+    if not HAS_NUMPY or not os.path.exists(path):
+        return None
+    try:
+        pack = GalleryBundle(path)
+    except (OSError, ValueError):
+        return None
+    if pack.backend != backend_name:
+        pack.close()
+        return None
+    return pack
+
+def export_gallery_bundle(db, path, since=None, backend=None, progress=print):
+    """Write db's people (with encodings, photos and thumbnails) to a single bundle file.
+
+    since is a peer's manifest (see gallery_manifest): only people whose hash differs from it are written, and
+    ids it has that db no longer does are listed as removed, so the bundle is a delta the peer can import.
+    Photos not encoded yet are encoded first when face_recognition is available; otherwise they travel without an
+    encoding and are encoded by the receiver. Returns counts.
+    """
+    backend = backend or get_embedding_backend()
+    load_known_faces_from_app_db(db, backend=backend)  # fills the cache with anything not encoded yet
+    cache = _load_encodings_cache(backend.name, encodings_cache_path(db))
+    pack = open_gallery_pack(db, backend.name)
+    manifest = gallery_manifest(db)
+    since = since or {}
+    entries, rows, vectors, photos = [], {}, [], {}  # photos: digest -> local path
+
+    def relocate(p):
+        """Path p will have on the receiver (its content-addressed path); collects its photo and encoding."""
+        digest = image_digest(p)
+        if digest is None:
+            return p
+        photos[digest] = p
+        if digest not in rows:
+            entry = cache.get(p)
+            enc = entry["encoding"] if entry is not None else (pack.encoding(digest) if pack is not None else None)
+            if enc is not None and np.asarray(enc).size == backend.dim:
+                rows[digest] = len(vectors)
+                vectors.append(np.asarray(enc, dtype=np.float32))
+        return content_image_path(digest)
+
+    try:
+        for person in db.get("people", []):
+            h = manifest[person["id"]]
+            if since.get(person["id"]) == h:
+                continue
+            record = dict(person)
+            if person.get("image"):
+                record["image"] = relocate(person["image"])
+            if person.get("samples"):
+                record["samples"] = [relocate(p) for p in person["samples"]]
+            entries.append({"record": record, "hash": h})
+    finally:
+        if pack is not None:
+            pack.close()
+    removed = sorted(set(since) - set(manifest))
+
+    def blobs():
+        for e in entries:
+            image = photos.get(addressed_digest(e["record"].get("image")) or "")
+            yield f"thumb:{e['record']['id']}", _thumbnail_jpeg(image) if image else None
+        for digest, p in photos.items():
+            with open(p, "rb") as f:
+                yield "img:" + digest, f.read()
+
+    header = {"version": 1, "backend": backend.name, "created": time.time(), "delta": bool(since),
+              "people": entries, "removed": removed, "manifest": manifest, "encodings": rows}
+    size = _write_bundle(path, header, vectors, backend.dim, blobs())
+    progress(f"{path}: {len(entries)} people, {len(removed)} removed, {len(vectors)} encodings, {size / 1e6:.1f} MB")
+    return {"people": len(entries), "removed": len(removed), "encodings": len(vectors), "bytes": size}
+
+def import_gallery_bundle(path, db, skip=(), backend=None):
+    """Merge a bundle into db and save it. People are matched by id and replaced only when their hash differs;
+    ids in skip (e.g. people edited locally since the last sync) are left alone. Photos are written to their
+    content-addressed paths. If db has no gallery pack yet and this is a full bundle, its encodings become the pack
+    (read by memory mapping at every load); otherwise they are added to the encodings cache. Either way nothing
+    is re-encoded, unless the bundle was made with another embedding backend.
+
+    Returns counts plus "applied": person id -> hash (None for removed) for everyone now matching the bundle, and
+    "seen": the same for everyone in the bundle, skipped or not. Callers record "applied" with remember_hashes.
+    """
+    backend_name = (backend or get_embedding_backend()).name
+    bundle = GalleryBundle(path)
+    result = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "skipped": 0, "applied": {}, "seen": {}}
+    try:
+        people = db.setdefault("people", [])
+        index = {p.get("id"): i for i, p in enumerate(people)}
+        taken = []
+        for record, h in zip(bundle.people, bundle.hashes):
+            pid = record.get("id")
+            i = index.get(pid)
+            result["seen"][pid] = h
+            if i is not None and person_hash(people[i]) == h:
+                result["unchanged"] += 1
+                result["applied"][pid] = h
+                continue
+            if pid in skip:
+                result["skipped"] += 1
+                continue
+            for p in _photos(record):
+                digest = addressed_digest(p)
+                data = bundle.image_bytes(digest) if digest else None
+                if data is not None and not os.path.exists(p):
+                    os.makedirs(os.path.dirname(p), exist_ok=True)
+                    with open(p + ".tmp", "wb") as f:
+                        f.write(data)
+                    os.replace(p + ".tmp", p)
+            if i is None:
+                index[pid] = len(people)
+                people.append(dict(record))
+                result["added"] += 1
+            else:
+                people[i] = dict(record)
+                result["updated"] += 1
+            taken.append(record)
+            result["applied"][pid] = h
+        result["seen"].update(dict.fromkeys(bundle.removed))
+        gone = {pid for pid in bundle.removed if pid in index and pid not in skip}
+        if gone:
+            db["people"] = [p for p in people if p.get("id") not in gone]
+            result["removed"] = len(gone)
+            result["applied"].update(dict.fromkeys(gone))
+        save_db(db)
+        if bundle.backend == backend_name and bundle.encodings is not None and len(bundle.encodings):
+            pack_path = gallery_pack_path(db)
+            if not bundle.delta and not os.path.exists(pack_path):
+                os.makedirs(os.path.dirname(pack_path) or ".", exist_ok=True)
+                _write_bundle(pack_path, {"version": 1, "backend": bundle.backend, "created": time.time(),
+                                          "encodings": bundle._rows}, list(bundle.encodings), bundle.dim)
+            elif taken:
+                cache_path = encodings_cache_path(db)
+                cache = _load_encodings_cache(backend_name, cache_path)
+                for record in taken:
+                    for p in _photos(record):
+                        digest = addressed_digest(p)
+                        enc = bundle.encoding(digest) if digest else None
+                        if enc is not None and os.path.exists(p):
+                            cache[p] = {"mtime": os.path.getmtime(p), "sha": digest, "encoding": enc}
+                _save_encodings_cache(cache, backend_name, cache_path)
+    finally:
+        bundle.close()
+    return result
+
+def sync_gallery(db, target, backend=None, progress=print):
+    """Two-way sync of db's people through a shared directory (USB stick, network share, synced folder).
+
+    The directory holds delta bundles named <time>-<device>.bundle. Bundles this device has not applied yet are
+    imported in order, except for people added, edited or deleted here since the last sync, which are kept and
+    then pushed as one new delta. Every device therefore ends up with the most recently pushed version of each
+    person. A person counts as changed here when their hash differs from the one last agreed with this target or,
+    for people the target has not exchanged with this device yet, from the one this device last imported or
+    pushed anywhere (so a device provisioned from a full bundle does not mistake its copy for an edit).
+    Returns counts.
+    """
+    os.makedirs(target, exist_ok=True)
+    state = load_sync_state(db)
+    device, known = state["device"], state["known"]
+    tstate = state["targets"].setdefault(os.path.abspath(target), {"applied": [], "synced": {}})
+    synced, applied = tstate["synced"], tstate["applied"]
+    local = gallery_manifest(db)
+    base = {**known, **synced}
+    mine = {pid for pid, h in local.items() if base.get(pid) != h} | (set(base) - set(local))
+    pulled = collections.Counter()
+    for name in sorted(os.listdir(target)):
+        if not name.endswith(".bundle") or name in applied:
+            continue
+        r = import_gallery_bundle(os.path.join(target, name), db, skip=mine, backend=backend)
+        remember_hashes(state, r.pop("applied"))
+        for pid, h in r.pop("seen").items():  # what the target now holds, so the push below covers skipped people
+            if h is None:
+                synced.pop(pid, None)
+            else:
+                synced[pid] = h
+        pulled.update(r)
+        applied.append(name)
+    local = gallery_manifest(db)
+    pushed = {"people": 0, "removed": 0}
+    if any(synced.get(pid) != h for pid, h in local.items()) or set(synced) - set(local):
+        name = f"{time.time_ns():020d}-{device}.bundle"
+        pushed = export_gallery_bundle(db, os.path.join(target, name), since=synced, backend=backend, progress=progress)
+        applied.append(name)
+    tstate["synced"] = local
+    state["known"] = dict(local)
+    save_sync_state(db, state)
+    progress("Pulled: " + "  ".join(f"{k}={v}" for k, v in sorted(pulled.items())) if pulled else "Nothing to pull")
+    return {"pulled": dict(pulled), "pushed": {k: pushed[k] for k in ("people", "removed")}}
+
+# ---------------- MEMORY PROFILING ----------------
+MEMPROFILE = os.environ.get("MA_MEMPROFILE") == "1"  # opt-in: write periodic memory reports while the app runs
+MEMPROFILE_INTERVAL_SEC = float(os.environ.get("MA_MEMPROFILE_INTERVAL", "300"))
+MEMPROFILE_REPORT_FILE = "memory_report.jsonl"
+MEMPROFILE_TOP = 15          # allocation sites listed per report, largest growth since the previous report first
+MEMPROFILE_FRAMES = 8        # traceback depth tracemalloc keeps per allocation
+MEMPROFILE_WATCH = ("Image", "PhotoImage", "CTkImage", "CTkLabel", "CTkFrame", "CTkEntry", "CTkButton",
+                    "CaptureReservoir", "deque")
+NUMPY_TRACE_DOMAIN = 389047  # tracemalloc domain numpy reports array buffers under
+SOAK_WARMUP_SEC = 120        # soak growth is measured from here on, once caches and the gallery are filled
+
+def rss_bytes():
+    """Resident set size of this process: current on Linux, peak elsewhere. None if it can't be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == "Darwin" else peak * 1024
+    except Exception:
+        return None
+
+def object_counts(names=MEMPROFILE_WATCH):
+    """Live garbage-collected objects per watched type name. numpy arrays are not gc-tracked; see numpy_mb instead."""
+    wanted = set(names)
+    counts = collections.Counter(type(o).__name__ for o in gc.get_objects() if type(o).__name__ in wanted)
+    return {n: counts.get(n, 0) for n in names}
+
+class MemoryProfiler:
+    """Opt-in memory instrumentation. Each sample() appends one JSON line to the report: RSS, memory traced by
+    tracemalloc (numpy buffers separately), live counts of image/widget types, Tk image handles when tk_root is
+    given, and the allocation sites that grew most since the previous sample (snapshot diff).
+
+    sample() does not schedule itself: the app calls it from after() so Tk is only touched on its own thread.
+    """
+    def __init__(self, report_path=MEMPROFILE_REPORT_FILE, top=MEMPROFILE_TOP, frames=MEMPROFILE_FRAMES, tk_root=None):
+        self.report_path = report_path
+        self.top = top
+        self.frames = frames
+        self.tk_root = tk_root
+        self.started_at = None
+        self._prev = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.started_at = time.time()
+        self._prev = self._snapshot()
+        return self
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+
+    def sample(self):
+        """Take one report; returns the record that was written."""
+        snap = self._snapshot()
+        growth = snap.compare_to(self._prev, "lineno")[:self.top]
+        self._prev = snap
+        traced, _ = tracemalloc.get_traced_memory()
+        numpy_bytes = sum(t.size for t in snap.filter_traces([tracemalloc.DomainFilter(True, NUMPY_TRACE_DOMAIN)]).traces)
+        rss = rss_bytes()
+        record = {
+            "ts": time.time(), "uptime_sec": round(time.time() - self.started_at, 1),
+            "rss_mb": round(rss / 1e6, 2) if rss is not None else None,
+            "traced_mb": round(traced / 1e6, 2), "numpy_mb": round(numpy_bytes / 1e6, 2),
+            "objects": object_counts(),
+            "growth": [{"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "kb": round(s.size_diff / 1024, 1),
+                        "count": s.count_diff} for s in growth if s.size_diff],
+        }
+        if self.tk_root is not None:
+            try:
+                record["tk_images"] = len(self.tk_root.tk.call("image", "names"))
+            except Exception:
+                pass
+        try:
+            with open(self.report_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
+        return record
+
+def soak_test(minutes, max_growth_mb, sources="synthetic", ui=False, interval=60.0, warmup=SOAK_WARMUP_SEC,
+              report_path=MEMPROFILE_REPORT_FILE, progress=print, user=None):
+    """Run recognition on a (by default synthetic) source for `minutes`, sampling memory every `interval` seconds.
+
+    Growth is RSS at the end minus RSS at the first sample after warm-up; the least-squares slope over the same
+    samples is reported as MB/hour. With ui=True the real MemoryAssistant page runs in a window, so per-frame image
+    and widget churn is included; otherwise a headless subscriber stands in for it. The gallery is user's account
+    (the device database when None). Returns (passed, summary).
+    """
+    global MA_SOURCES
+    samples = []
+    end_at = time.time() + minutes * 60.0
+
+    def take(profiler):
+        rec = profiler.sample()
+        mb = rec["rss_mb"] if rec["rss_mb"] is not None else rec["traced_mb"]
+        samples.append((rec["uptime_sec"], mb))
+        top = rec["growth"][0]["where"] if rec["growth"] else "-"
+        progress(f"{rec['uptime_sec'] / 60:7.1f} min  {mb:8.1f} MB  numpy {rec['numpy_mb']:.1f} MB  top growth {top}")
+
+    if ui:
+        MA_SOURCES = sources
+        app = App()
+        if user is not None:
+            app.sign_in(user)
+        profiler = MemoryProfiler(report_path, tk_root=app).start()
+        app.show(MemoryAssistant)
+
+        def tick():
+            take(profiler)
+            if time.time() < end_at:
+                app.after(int(interval * 1000), tick)
+            else:
+                app.frames[MemoryAssistant].on_hide()
+                app.quit()
+        app.after(int(interval * 1000), tick)
+        app.mainloop()
+    else:
+        latest = {}
+        service = RecognitionService(parse_sources(sources), load_db(user["id"] if user else None))
+        service.subscribe(lambda event, payload: latest.update({event.get("source_id"): (event, payload)}))
+        service.reload()
+        if not service.start():
+            raise RuntimeError(f"Could not open {sources}")
+        profiler = MemoryProfiler(report_path).start()
+        next_sample = time.time() + interval
+        try:
+            while time.time() < end_at:
+                delay = service.tick()
+                time.sleep((delay if delay is not None else 500) / 1000.0)
+                if time.time() >= next_sample:
+                    take(profiler)
+                    next_sample += interval
+        finally:
+            service.stop()
+
+    post = [(t, mb) for t, mb in samples if t >= warmup]
+    if len(post) < 2:
+        return False, {"error": "not enough samples after warm-up; run longer or lower --interval"}
+    ts = np.array([t for t, _ in post]) / 3600.0
+    mbs = np.array([mb for _, mb in post])
+    slope = float(np.polyfit(ts, mbs, 1)[0]) if np.ptp(ts) > 0 else 0.0
+    summary = {"start_mb": float(mbs[0]), "end_mb": float(mbs[-1]), "growth_mb": float(mbs[-1] - mbs[0]), "mb_per_hour": slope,
+               "samples": len(post), "max_growth_mb": max_growth_mb}
+    return summary["growth_mb"] <= max_growth_mb, summary
+
 # ---------------- RUN ----------------
 if __name__=="__main__":
-    app=App()
-    app.mainloop()
+    import argparse
+    parser = argparse.ArgumentParser(description="MindMenders")
+    sub = parser.add_subparsers(dest="command")
+    p = sub.add_parser("bench-encode", help="Measure face encoding throughput against batch size")
+    p.add_argument("images", nargs="*", help="Images with faces (default: every person's photo)")
+    p.add_argument("--faces", type=int, default=64)
+    p.add_argument("--backend", choices=sorted(EMBEDDING_BACKENDS), default=None)
+    p.add_argument("--user", default=None, help="Email of the account whose photos are used (default images)")
+    p = sub.add_parser("import", help="Bulk-enroll people from a folder of photos or a CSV manifest (resumable)")
+    p.add_argument("source", help="Folder of photos, or CSV with image,name[,relation,notes] columns")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--user", default=None, help="Email of the account to import into (required once accounts exist)")
+    p = sub.add_parser("llm-stub", help="Serve a fake Ollama-compatible endpoint for trying the voice assistant")
+    p.add_argument("--port", type=int, default=11434)
+    p = sub.add_parser("serve", help="Run the recognition service for local clients (the window connects with MA_DAEMON)")
+    p.add_argument("--address", default=None, help=f"unix:/path or host:port (default: MA_DAEMON or {DAEMON_DEFAULT_ADDRESS})")
+    p.add_argument("--sources", default=None, help="Cameras and/or video files (default: MA_SOURCES)")
+    p.add_argument("--user", default=None, help="Email of the account whose people are recognized")
+    p.add_argument("--profile", choices=sorted(PERFORMANCE_PROFILES), default=MA_PROFILE)
+    p = sub.add_parser("soak", help="Run recognition for a long time and fail if memory grows past a threshold")
+    p.add_argument("--minutes", type=float, default=240)
+    p.add_argument("--max-growth-mb", type=float, default=50)
+    p.add_argument("--interval", type=float, default=60, help="Seconds between memory reports")
+    p.add_argument("--warmup", type=float, default=SOAK_WARMUP_SEC, help="Seconds before growth is measured")
+    p.add_argument("--sources", default=None, help="Default: a synthetic camera showing the first person's photo")
+    p.add_argument("--ui", action="store_true", help="Drive the real Memory Assistant page in a window")
+    p.add_argument("--user", default=None, help="Email of the account whose gallery is loaded")
+    p = sub.add_parser("bench-idle", help="Measure CPU time and wake-up latency of the motion-gated idle mode on a video")
+    p.add_argument("video")
+    p.add_argument("--frames", type=int, default=None)
+    p = sub.add_parser("bench-gallery", help="Measure memory, speed and accuracy of quantized gallery scans")
+    p.add_argument("--size", type=int, default=100000)
+    p.add_argument("--queries", type=int, default=500)
+    p.add_argument("--tolerance", type=float, default=None, help="Match distance (default: the backend's threshold)")
+    p.add_argument("--user", default=None, help="Email of the account whose encodings seed the synthetic gallery")
+    p = sub.add_parser("gallery", help="Export, import or sync people as single-file gallery bundles")
+    p.add_argument("action", choices=["export", "import", "manifest", "sync"])
+    p.add_argument("path", help="Bundle file (export/import), manifest JSON to write (manifest), or shared folder (sync)")
+    p.add_argument("--since", default=None, help="export: a peer's manifest JSON; only people that differ are written")
+    p.add_argument("--user", default=None, help="Email of the account whose people are exported or updated")
+    args = parser.parse_args()
+
+    def account(email):
+        """The account for --user, or None for the device database. Exits if there is no such account, or if
+        accounts exist (so the device database holds no people any more) and none was named."""
+        device = load_db()
+        user = find_user(email, device) if email else None
+        if email and user is None:
+            raise SystemExit(f"No account for {email}")
+        if user is None and device.get("users"):
+            raise SystemExit("Accounts exist on this device; pass --user EMAIL")
+        return user
+
+    if args.command == "bench-encode":
+        if not HAS_FACE_RECOGNITION:
+            raise SystemExit("bench-encode needs face_recognition: pip install face_recognition")
+        user = None if args.images else account(args.user)
+        paths = args.images or [p.get("image") for p in load_db(user["id"] if user else None).get("people", []) if p.get("image")]
+        backend = get_embedding_backend(args.backend)
+        print(f"backend {backend.name} (match distance < {backend.threshold:.3f})")
+        for r in benchmark_encoding_batches(paths, faces=args.faces, backend=backend):
+            print(f"batch {r['batch']:>3}: {r['faces_per_sec']:8.1f} faces/s  {r['ms_per_face']:7.2f} ms/face")
+    elif args.command == "import":
+        user = account(args.user)
+        bulk_import(args.source, args.workers, user_id=user["id"] if user else None)
+    elif args.command == "llm-stub":
+        serve_llm_stub(args.port)
+    elif args.command == "serve":
+        if not HAS_NUMPY or not HAS_FACE_RECOGNITION:
+            raise SystemExit("serve needs numpy and face_recognition: pip install numpy face_recognition")
+        user = account(args.user)
+        user_id = user["id"] if user else None
+        log = SightingLog()
+        service = RecognitionService(parse_sources(args.sources or MA_SOURCES), load_db(user_id), log, unknown_sighting_store(user_id),
+                                     profile=args.profile)
+        server = RecognitionServer(service, args.address, user_id)
+        service.reload()
+        if not service.start():
+            raise SystemExit("Could not open any source")
+        server.start()
+        print(f"Recognition service on {server.address} · sources: {', '.join(service.source_labels())}")
+        try:
+            while True:
+                delay = service.tick()
+                time.sleep((delay if delay is not None else 500) / 1000.0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+            service.stop()
+            log.close()
+    elif args.command == "soak":
+        if not HAS_NUMPY or not HAS_FACE_RECOGNITION:
+            raise SystemExit("soak needs numpy and face_recognition: pip install numpy face_recognition")
+        user = account(args.user)
+        sources = args.sources
+        if sources is None:
+            face = next((p.get("image") for p in load_db(user["id"] if user else None).get("people", []) if p.get("image")), "")
+            sources = f"synthetic:{face}" if face else "synthetic"
+        passed, summary = soak_test(args.minutes, args.max_growth_mb, sources, args.ui, args.interval, args.warmup, user=user)
+        if "error" in summary:
+            raise SystemExit(summary["error"])
+        print(f"{'PASS' if passed else 'FAIL'}: {summary['start_mb']:.1f} -> {summary['end_mb']:.1f} MB "
+              f"({summary['growth_mb']:+.1f} MB, {summary['mb_per_hour']:+.2f} MB/hour, limit {args.max_growth_mb} MB)")
+        raise SystemExit(0 if passed else 1)
+    elif args.command == "bench-idle":
+        if not HAS_FACE_RECOGNITION:
+            raise SystemExit("bench-idle needs face_recognition: pip install face_recognition")
+        for r in benchmark_motion_gate(args.video, args.frames):
+            wake = f"{r['wake_ms']:.0f} ms" if r["wake_ms"] is not None else "n/a"
+            print(f"{r['mode']:>6}: {r['cpu_sec']:7.2f} s CPU  {r['detections']}/{r['frames']} frames detected  "
+                  f"{r['wakeups']} wake-ups  {r['idle_sec']:.0f} s idle  mean wake latency {wake}")
+    elif args.command == "bench-gallery":
+        user = account(args.user)
+        for r in benchmark_gallery_quantization(args.size, args.queries, args.tolerance, db=load_db(user["id"]) if user else None):
+            print(f"{r['mode']:>8}: {r['bytes'] / 1e6:8.2f} MB  {r['ms_per_query']:7.3f} ms/query  "
+                  f"decision mismatch {r['decision_mismatch']:.2%}  max distance error {r['max_distance_error']:.5f}")
+    elif args.command == "gallery":
+        user = account(args.user)
+        db = load_db(user["id"] if user else None)
+        if args.action == "export":
+            since = None
+            if args.since:
+                with open(args.since) as f:
+                    since = json.load(f)
+            export_gallery_bundle(db, args.path, since)
+        elif args.action == "import":
+            r = import_gallery_bundle(args.path, db)
+            state = load_sync_state(db)
+            remember_hashes(state, r["applied"])
+            save_sync_state(db, state)
+            print("  ".join(f"{k}={v}" for k, v in r.items() if k not in ("applied", "seen")))
+        elif args.action == "manifest":
+            with open(args.path, "w") as f:
+                json.dump(gallery_manifest(db), f)
+        else:
+            r = sync_gallery(db, args.path)
+            print(f"Pushed {r['pushed']['people']} people, {r['pushed']['removed']} removals")
+    else:
+        app=App()
+        app.mainloop()